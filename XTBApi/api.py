@@ -9,18 +9,30 @@ Main module
 
 # import inspect
 import enum
-import json
+import os
+import threading
 import time
-from datetime import datetime
 from websockets.sync.client import connect
 from websockets.exceptions import WebSocketException
 from XTBApi.exceptions import *
+from XTBApi.codec import dumps, loads, LazyPayload
+from XTBApi.ratelimit import TokenBucket
+from XTBApi.metrics import Metrics
+from XTBApi.symbols import SymbolCache
+from XTBApi.hours import TradingHours
+from XTBApi.trades import TradeStore
+from XTBApi.supervisor import Supervisor, NON_IDEMPOTENT
 import logging
 
 LOGGER = logging.getLogger('XTBApi.api')
 LOGGER.setLevel(logging.INFO)
 LOGIN_TIMEOUT = 120
+XTB_HOST = os.getenv("XTB_HOST", default="wss://ws.xtb.com")
 MAX_TIME_INTERVAL = 0.200
+# error codes meaning the session itself is gone
+RELOGIN_CODES = ('BE103',)
+# streamed tick prices younger than this are used for market orders
+TICK_MAX_AGE = 5
 
 
 class STATUS(enum.Enum):
@@ -94,13 +106,69 @@ def _check_volume(volume):
         return volume
 
 
+def _get_mode_enum(mode):
+    """convert buy/sell mode (name or value) into MODES"""
+    if mode in [MODES.BUY.value, MODES.SELL.value]:
+        return [x for x in MODES if x.value == mode][0]
+    elif mode in ['buy', 'sell']:
+        modes = {'buy': MODES.BUY, 'sell': MODES.SELL}
+        return modes[mode]
+    else:
+        raise ValueError("mode can be buy or sell")
+
+
+def _safeguard_prices(mode_value, price, digits, kwargs):
+    """compute (tp, sl) from rate, pip or value safeguards in kwargs"""
+    _tp = _sl = 0
+    # safeguard by rate
+    rate_tp = kwargs.pop("rate_tp", 0)
+    rate_sl = kwargs.pop("rate_sl", 0)
+    if mode_value == MODES.BUY.value:
+        _tp = price * (1 + rate_tp) if rate_tp else _tp
+        _sl = price * (1 - rate_sl) if rate_sl else _sl
+    elif mode_value == MODES.SELL.value:
+        _tp = price * (1 - rate_tp) if rate_tp else _tp
+        _sl = price * (1 + rate_sl) if rate_sl else _sl
+    # safeguard by pip
+    pip_tp = kwargs.pop("pip_tp", 0) / 10**digits
+    pip_sl = kwargs.pop("pip_sl", 0) / 10**digits
+    if mode_value == MODES.BUY.value:
+        _tp = price + pip_tp if pip_tp else _tp
+        _sl = price - pip_sl if pip_sl else _sl
+    elif mode_value == MODES.SELL.value:
+        _tp = price - pip_tp if pip_tp else _tp
+        _sl = price + pip_sl if pip_sl else _sl
+    # safeguard by value
+    tp = kwargs.pop("tp", _tp)
+    sl = kwargs.pop("sl", _sl)
+    return tp, sl
+
+
+def _trading_hours_in_sec(response):
+    """convert getTradingHours fromT/toT from ms to s, in place"""
+    for symbol in response:
+        for day in symbol['trading']:
+            day['fromT'] = int(day['fromT'] / 1000)
+            day['toT'] = int(day['toT'] / 1000)
+        for day in symbol['quotes']:
+            day['fromT'] = int(day['fromT'] / 1000)
+            day['toT'] = int(day['toT'] / 1000)
+    return response
+
+
 class BaseClient(object):
     """main client class"""
 
-    def __init__(self):
+    def __init__(self, limiter=None, host=None):
         self.ws = None
+        self.host = host or XTB_HOST
         self._login_data = None
-        self._time_last_request = time.time() - MAX_TIME_INTERVAL
+        self.stream_session_id = None
+        self.limiter = limiter if limiter is not None else TokenBucket(1 / MAX_TIME_INTERVAL)
+        self.metrics = Metrics()
+        self.supervisor = Supervisor(self)
+        self.time_last_command = 0.0
+        self._lock = threading.RLock()
         self.status = STATUS.NOT_LOGGED
         LOGGER.debug("BaseClient inited")
         self.LOGGER = logging.getLogger('XTBApi.api.BaseClient')
@@ -108,36 +176,56 @@ class BaseClient(object):
     def _login_decorator(self, func, *args, **kwargs):
         if self.status == STATUS.NOT_LOGGED:
             raise NotLogged()
+        command = args[0]['command']
+        generation = self.supervisor.generation
         try:
             return func(*args, **kwargs)
+        except CommandFailed as e:
+            if e.err_code not in RELOGIN_CODES:
+                raise
+            LOGGER.info(f"re-logging in due to session rejected. ({e})")
         except SocketError as e:
             LOGGER.info(f"re-logging in due to LOGIN_TIMEOUT gone. ({e})")
-            self.login(self._login_data[0], self._login_data[1])
-            return func(*args, **kwargs)
+            if command in NON_IDEMPOTENT:
+                # the command may have landed, never replay it blindly
+                self.supervisor.reconnect(generation)
+                raise
         except Exception as e:
             LOGGER.warning(e)
-            self.login(self._login_data[0], self._login_data[1])
-            return func(*args, **kwargs)
+            if command in NON_IDEMPOTENT:
+                self.supervisor.reconnect(generation)
+                raise
+        self.metrics.inc_retry(command)
+        self.supervisor.reconnect(generation)
+        return func(*args, **kwargs)
 
     def _send_command(self, dict_data):
         """send command to api"""
-        time_interval = time.time() - self._time_last_request
-        self.LOGGER.debug("took {} s.".format(time_interval))
-        if time_interval < MAX_TIME_INTERVAL:
-            time.sleep(MAX_TIME_INTERVAL - time_interval)
-        try:
-            self.ws.send(json.dumps(dict_data))
-            response = self.ws.recv()
-        except WebSocketException:
-            raise SocketError()
-        self._time_last_request = time.time()
-        res = json.loads(response)
+        command = dict_data['command']
+        self.metrics.observe_throttle(self.limiter.acquire())
+        request = dumps(dict_data)
+        with self._lock:
+            time_start = time.perf_counter()
+            try:
+                self.ws.send(request)
+                response = self.ws.recv()
+            except WebSocketException:
+                self.metrics.inc_error(command)
+                raise SocketError()
+            self.time_last_command = time.time()
+        time_recv = time.perf_counter()
+        res = loads(response)
+        self.metrics.observe_decode(command, time.perf_counter() - time_recv)
+        self.metrics.observe_command(command, time_recv - time_start, len(request), len(response))
         if res['status'] is False:
-            self.LOGGER.debug(res)
+            self.metrics.inc_error(command)
+            self.LOGGER.debug("%s", LazyPayload(res))
             raise CommandFailed(res)
+        if 'streamSessionId' in res.keys():
+            self.stream_session_id = res['streamSessionId']
         if 'returnData' in res.keys():
             self.LOGGER.info("CMD: done")
-            self.LOGGER.debug(res['returnData'])
+            self.LOGGER.debug("%s", LazyPayload(res['returnData']))
             return res['returnData']
 
     def _send_command_with_check(self, dict_data):
@@ -147,9 +235,9 @@ class BaseClient(object):
     def login(self, user_id, password, mode='demo'):
         """login command"""
         data = _get_data("login", userId=user_id, password=password)
-        self.ws = connect(f"wss://ws.xtb.com/{mode}")
+        self.ws = connect(f"{self.host}/{mode}")
         response = self._send_command(data)
-        self._login_data = (user_id, password)
+        self._login_data = (user_id, password, mode)
         self.status = STATUS.LOGGED
         self.LOGGER.info("CMD: login...")
         return response
@@ -158,7 +246,8 @@ class BaseClient(object):
         """logout command"""
         data = _get_data("logout")
         response = self._send_command(data)
-        self.status = STATUS.LOGGED
+        self.status = STATUS.NOT_LOGGED
+        self.ws.close()
         self.LOGGER.info("CMD: logout...")
         return response
 
@@ -289,14 +378,7 @@ class BaseClient(object):
         self.LOGGER.info(f"CMD: get trading hours of len "
                          f"{len(trade_position_list)}...")
         response = self._send_command_with_check(data)
-        for symbol in response:
-            for day in symbol['trading']:
-                day['fromT'] = int(day['fromT'] / 1000)
-                day['toT'] = int(day['toT'] / 1000)
-            for day in symbol['quotes']:
-                day['fromT'] = int(day['fromT'] / 1000)
-                day['toT'] = int(day['toT'] / 1000)
-        return response
+        return _trading_hours_in_sec(response)
 
     def get_version(self):
         """getVersion command"""
@@ -376,30 +458,21 @@ class Transaction(object):
 
 class Client(BaseClient):
     """advanced class of client"""
-    def __init__(self):
-        super().__init__()
-        self.trade_rec = {}
+    def __init__(self, limiter=None, host=None, symbols=None, hours=None):
+        super().__init__(limiter, host)
+        self.trades = TradeStore(Transaction)
+        self.trade_rec = self.trades.orders
+        self.symbols = symbols if symbols is not None else SymbolCache()
+        self.hours = hours if hours is not None else TradingHours()
+        self.tick_prices = {}
         self.LOGGER = logging.getLogger('XTBApi.api.Client')
         self.LOGGER.info("Client inited")
 
     def check_if_market_open(self, list_of_symbols):
-        """check if market is open for symbol in symbols"""
-        _td = datetime.today()
-        actual_tmsp = _td.hour * 3600 + _td.minute * 60 + _td.second
-        response = self.get_trading_hours(list_of_symbols)
-        market_values = {}
-        for symbol in response:
-            today_values = [day for day in symbol['trading'] if day['day'] ==
-                            _td.isoweekday()]
-            if not today_values:
-                market_values[symbol['symbol']] = False
-                continue
-            today_values = today_values[0]
-            if today_values['fromT'] <= actual_tmsp <= today_values['toT']:
-                market_values[symbol['symbol']] = True
-            else:
-                market_values[symbol['symbol']] = False
-        return market_values
+        """check if market is open for symbol in symbols, on a fresh schedule
+        (every session of the week, as get_market_status)"""
+        self.hours.refresh(self, list_of_symbols)
+        return self.hours.status(list_of_symbols)
 
     def get_lastn_candle_history(self, symbol, timeframe_in_seconds, number):
         """get last n candles of timeframe"""
@@ -417,7 +490,7 @@ class Client(BaseClient):
                 timeframe_in_seconds // 60,
                 time.time() - sec_prior
             )
-            LOGGER.debug(res)
+            LOGGER.debug("%s", LazyPayload(res))
             res['rateInfos'] = res['rateInfos'][-number:]
             sec_prior *= 3
         candle_history = []
@@ -432,23 +505,14 @@ class Client(BaseClient):
                 'high': hg_pr, 'low': lw_pr, 'volume': candle['vol']
             }
             candle_history.append(new_candle_entry)
-        LOGGER.debug(candle_history)
+        LOGGER.debug("%s", LazyPayload(candle_history))
         return candle_history
 
-    def update_trades(self):
-        """update trade list"""
-        trades = self.get_trades()
-        self.trade_rec.clear()
-        for trade in trades:
-            obj_trans = Transaction(trade)
-            self.trade_rec[obj_trans.order_id] = obj_trans
-        # values_to_del = [key for key, trad_not_listed in
-        #                 self.trade_rec.items() if trad_not_listed.order_id
-        #                 not in [x['order'] for x in trades]]
-        # for key in values_to_del:
-        #    del self.trade_rec[key]
-        self.LOGGER.info(f"updated {len(self.trade_rec)} trades")
-        # self.LOGGER.info(trades)
+    def update_trades(self, force=False):
+        """update trade list, getTrades only when the store is stale"""
+        if force or self.trades.stale:
+            changed = self.trades.sync(self.get_trades())
+            self.LOGGER.info(f"updated {len(self.trade_rec)} trades ({changed} changed)")
         return self.trade_rec
 
     def get_trade_profit(self, trans_id):
@@ -460,46 +524,26 @@ class Client(BaseClient):
 
     def open_trade(self, mode, symbol, volume, **kwargs):
         """open trade transaction"""
-        mode_enum: MODES = MODES.BUY
-        if mode in [MODES.BUY.value, MODES.SELL.value]:
-            mode_enum = [x for x in MODES if x.value == mode][0]
-        elif mode in ['buy', 'sell']:
-            modes = {'buy': MODES.BUY, 'sell': MODES.SELL}
-            mode_enum = modes[mode]
-        else:
-            raise ValueError("mode can be buy or sell")
+        mode_enum = _get_mode_enum(mode)
         mode_name = mode_enum.name
         mode_value = mode_enum.value
         self.LOGGER.info(f"opening trade of {symbol} of {volume} with {mode_name}")
         conversion_mode = {MODES.BUY.value: 'ask', MODES.SELL.value: 'bid'}
-        res_symbol = self.get_symbol(symbol)
-        price = res_symbol[conversion_mode[mode_value]]
+        # static fields from symbol cache, price from a fresh streamed tick
+        res_symbol = self.symbols.get(symbol, self)
+        tick = self.tick_prices.get(symbol)
+        if res_symbol and tick and time.time() - tick['timestamp'] / 1000 < TICK_MAX_AGE:
+            price = tick[conversion_mode[mode_value]]
+        else:
+            quote = self.get_symbol(symbol)
+            self.symbols.update(quote)
+            res_symbol = res_symbol or quote
+            price = quote[conversion_mode[mode_value]]
         digits = res_symbol['precision']
-        _tp = _sl = 0
-        # safeguard by rate
-        rate_tp = kwargs.pop("rate_tp", 0)
-        rate_sl = kwargs.pop("rate_sl", 0)
-        if mode_value == MODES.BUY.value:
-            _tp = price * (1 + rate_tp) if rate_tp else _tp
-            _sl = price * (1 - rate_sl) if rate_sl else _sl
-        elif mode_value == MODES.SELL.value:
-            _tp = price * (1 - rate_tp) if rate_tp else _tp
-            _sl = price * (1 + rate_sl) if rate_sl else _sl
-        # safeguard by pip
-        pip_tp = kwargs.pop("pip_tp", 0) / 10**digits
-        pip_sl = kwargs.pop("pip_sl", 0) / 10**digits
-        if mode_value == MODES.BUY.value:
-            _tp = price + pip_tp if pip_tp else _tp
-            _sl = price - pip_sl if pip_sl else _sl
-        elif mode_value == MODES.SELL.value:
-            _tp = price - pip_tp if pip_tp else _tp
-            _sl = price + pip_sl if pip_sl else _sl
-        # safeguard by value
-        tp = kwargs.pop("tp", _tp)
-        sl = kwargs.pop("sl", _sl)
+        tp, sl = _safeguard_prices(mode_value, price, digits, kwargs)
         response = self.trade_transaction(symbol, mode_value, 0, volume,
                                           price=price, take_profit=tp, stop_loss=sl)
-        self.update_trades()
+        self.trades.invalidate()
         status = self.trade_transaction_status(response['order'])['requestStatus']
         self.LOGGER.info(f"open_trade completed with status of {status}")
         if status != 3:
@@ -517,6 +561,7 @@ class Client(BaseClient):
         except CommandFailed as e:
             if e.err_code == 'BE51':  # order already closed
                 self.LOGGER.debug("BE51 error code noticed")
+                self.trades.discard(order_id)
                 return 'BE51'
             else:
                 raise
@@ -524,6 +569,7 @@ class Client(BaseClient):
         self.LOGGER.debug(f"close_trade completed with status of {status}")
         if status != 3:
             raise TransactionRejected(status)
+        self.trades.discard(order_id)
         return response
 
     def close_trade(self, trans):
@@ -539,29 +585,16 @@ class Client(BaseClient):
         """close all trades"""
         self.update_trades()
         self.LOGGER.debug(f"closing {len(self.trade_rec)} trades")
-        trade_ids = self.trade_rec.keys()
+        trade_ids = list(self.trade_rec.keys())
         for trade_id in trade_ids:
             self.close_trade_only(trade_id)
 
     def get_market_status(self, list_of_symbols):
-        """check if market status is open for symbol in symbols"""
-        from pytz import utc
-        gmt_time = datetime.now(tz=utc)
-        gmt_date = gmt_time.date()
-        sec_from_gmt_midnight = 3600*gmt_time.hour + 60*gmt_time.minute + gmt_time.second
-        response = self.get_trading_hours(list_of_symbols)
-        status = {}
-        for res in response:
-            today_market = {'open': mkt for mkt in res['trading'] if mkt['day'] == gmt_date.isoweekday()}
-            if not today_market:
-                status[res['symbol']] = False
-                continue
-            market_open = today_market['open']
-            if market_open['fromT'] <= sec_from_gmt_midnight <= market_open['toT']:
-                status[res['symbol']] = True
-            else:
-                status[res['symbol']] = False
-        return status
+        """check if market status is open for symbol in symbols
+        getTradingHours only when the cached weekly schedule is stale"""
+        if not self.hours.known(list_of_symbols):
+            self.hours.refresh(self, list_of_symbols)
+        return self.hours.status(list_of_symbols)
 
 # - next features -
 # TODO: withdraw
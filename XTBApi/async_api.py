@@ -0,0 +1,329 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.async_api
+~~~~~~~
+
+Asyncio client module, multiplexing commands on one socket by customTag
+"""
+
+import asyncio
+import itertools
+import time
+from websockets.client import connect
+from websockets.exceptions import WebSocketException
+from XTBApi.api import (BaseClient, Transaction, STATUS, MODES, RELOGIN_CODES,
+                        _get_data, _get_mode_enum,
+                        _safeguard_prices, _trading_hours_in_sec)
+from XTBApi.exceptions import *
+from XTBApi.hours import TradingHours
+from XTBApi.supervisor import NON_IDEMPOTENT
+from XTBApi.codec import dumps, loads, LazyPayload
+import logging
+
+LOGGER = logging.getLogger('XTBApi.async_api')
+LOGGER.setLevel(logging.INFO)
+
+
+class AsyncBaseClient(BaseClient):
+    """asyncio client class
+
+    Same command surface as BaseClient, every command returns an awaitable.
+    Each request is tagged with customTag, so several requests can be in
+    flight on one socket and responses are routed back by tag. Requests
+    failing together on one session share a single re-login."""
+
+    def __init__(self, limiter=None, host=None):
+        super().__init__(limiter, host)
+        self._tags = itertools.count(1)
+        self._pending = {}
+        self._reader = None
+        self._send_lock = None
+        self._relogin_lock = asyncio.Lock()
+        self.generation = 0
+        LOGGER.debug("AsyncBaseClient inited")
+        self.LOGGER = logging.getLogger('XTBApi.async_api.AsyncBaseClient')
+
+    async def _relogin(self, generation):
+        """re-login unless another request already did since generation"""
+        async with self._relogin_lock:
+            if generation != self.generation:
+                return
+            await self.login(*self._login_data)
+            self.metrics.inc_relogin()
+
+    async def _login_decorator(self, func, *args, **kwargs):
+        if self.status == STATUS.NOT_LOGGED:
+            raise NotLogged()
+        command = args[0]['command']
+        generation = self.generation
+        try:
+            return await func(*args, **kwargs)
+        except CommandFailed as e:
+            if e.err_code not in RELOGIN_CODES:
+                raise
+            LOGGER.info(f"re-logging in due to session rejected. ({e})")
+        except SocketError as e:
+            LOGGER.info(f"re-logging in due to LOGIN_TIMEOUT gone. ({e})")
+            if command in NON_IDEMPOTENT:
+                # the command may have landed, never replay it blindly
+                await self._relogin(generation)
+                raise
+        except Exception as e:
+            LOGGER.warning(e)
+            if command in NON_IDEMPOTENT:
+                await self._relogin(generation)
+                raise
+        self.metrics.inc_retry(command)
+        await self._relogin(generation)
+        return await func(*args, **kwargs)
+
+    async def _read_responses(self):
+        """route every incoming response to the future of its customTag"""
+        try:
+            async for message in self.ws:
+                time_recv = time.perf_counter()
+                res = loads(message)
+                decode_seconds = time.perf_counter() - time_recv
+                future = self._pending.pop(res.get('customTag'), None)
+                if future is None:
+                    self.LOGGER.warning("untagged response dropped: %s", LazyPayload(res))
+                    continue
+                if not future.done():
+                    future.set_result((res, len(message), decode_seconds))
+        except WebSocketException as e:
+            self.LOGGER.debug(f"reader stopped: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(SocketError())
+            self._pending.clear()
+
+    async def _send_command(self, dict_data):
+        """send tagged command to api and wait for its own response"""
+        command = dict_data['command']
+        tag = str(next(self._tags))
+        dict_data = dict(dict_data, customTag=tag)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[tag] = future
+        wait = self.limiter.reserve()
+        if wait > 0:
+            self.metrics.observe_throttle(wait)
+            await asyncio.sleep(wait)
+        request = dumps(dict_data)
+        async with self._send_lock:
+            time_start = time.perf_counter()
+            try:
+                await self.ws.send(request)
+            except WebSocketException:
+                self._pending.pop(tag, None)
+                self.metrics.inc_error(command)
+                raise SocketError()
+        res, size, decode_seconds = await future
+        self.metrics.observe_decode(command, decode_seconds)
+        self.metrics.observe_command(command, time.perf_counter() - time_start, len(request), size)
+        if res['status'] is False:
+            self.metrics.inc_error(command)
+            self.LOGGER.debug("%s", LazyPayload(res))
+            raise CommandFailed(res)
+        if 'streamSessionId' in res.keys():
+            self.stream_session_id = res['streamSessionId']
+        if 'returnData' in res.keys():
+            self.LOGGER.info("CMD: done")
+            self.LOGGER.debug("%s", LazyPayload(res['returnData']))
+            return res['returnData']
+
+    async def _close(self):
+        """close socket and stop the response reader"""
+        if self.ws is not None:
+            await self.ws.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+        self._reader = None
+
+    async def login(self, user_id, password, mode='demo'):
+        """login command"""
+        await self._close()
+        data = _get_data("login", userId=user_id, password=password)
+        self.ws = await connect(f"{self.host}/{mode}")
+        self._send_lock = asyncio.Lock()
+        self._reader = asyncio.create_task(self._read_responses())
+        response = await self._send_command(data)
+        self._login_data = (user_id, password, mode)
+        self.status = STATUS.LOGGED
+        self.generation += 1
+        self.LOGGER.info("CMD: login...")
+        return response
+
+    async def logout(self):
+        """logout command"""
+        data = _get_data("logout")
+        response = await self._send_command(data)
+        self.status = STATUS.NOT_LOGGED
+        await self._close()
+        self.LOGGER.info("CMD: logout...")
+        return response
+
+    async def get_trading_hours(self, trade_position_list):
+        """getTradingHours command"""
+        data = _get_data("getTradingHours", symbols=trade_position_list)
+        self.LOGGER.info(f"CMD: get trading hours of len "
+                         f"{len(trade_position_list)}...")
+        response = await self._send_command_with_check(data)
+        return _trading_hours_in_sec(response)
+
+    async def ping(self):
+        """ping command"""
+        data = _get_data("ping")
+        self.LOGGER.info("CMD: get ping...")
+        await self._send_command_with_check(data)
+
+    def _by_symbol(self, symbols, responses):
+        """{symbol: response}, leaving out (and logging) the symbols that failed"""
+        results = {}
+        for symbol, response in zip(symbols, responses):
+            if isinstance(response, Exception):
+                self.LOGGER.warning(f"{symbol} failed: {response!r}")
+                continue
+            results[symbol] = response
+        return results
+
+    async def get_chart_range_requests(self, symbols, period, start, end, ticks):
+        """getChartRangeRequest for many symbols at once, in flight together
+        return: {symbol: returnData}, without the symbols that failed"""
+        responses = await asyncio.gather(*[
+            self.get_chart_range_request(symbol, period, start, end, ticks)
+            for symbol in symbols
+        ], return_exceptions=True)
+        return self._by_symbol(symbols, responses)
+
+    async def get_symbols(self, symbols):
+        """getSymbol for many symbols at once, in flight together
+        return: {symbol: returnData}, without the symbols that failed"""
+        responses = await asyncio.gather(*[
+            self.get_symbol(symbol) for symbol in symbols
+        ], return_exceptions=True)
+        return self._by_symbol(symbols, responses)
+
+
+class AsyncClient(AsyncBaseClient):
+    """advanced asyncio class of client, mirror of Client"""
+    def __init__(self, limiter=None, host=None):
+        super().__init__(limiter, host)
+        self.trade_rec = {}
+        self.hours = TradingHours()
+        self.LOGGER = logging.getLogger('XTBApi.async_api.AsyncClient')
+        self.LOGGER.info("AsyncClient inited")
+
+    async def check_if_market_open(self, list_of_symbols):
+        """check if market is open for symbol in symbols, on a fresh schedule
+        (every session of the week, as get_market_status)"""
+        self.hours.load(await self.get_trading_hours(list_of_symbols))
+        return self.hours.status(list_of_symbols)
+
+    async def get_lastn_candle_history(self, symbol, timeframe_in_seconds, number):
+        """get last n candles of timeframe"""
+        acc_tmf = [60, 300, 900, 1800, 3600, 14400, 86400, 604800, 2592000]
+        if timeframe_in_seconds not in acc_tmf:
+            raise ValueError(f"timeframe not accepted, not in "
+                             f"{', '.join([str(x) for x in acc_tmf])}")
+        sec_prior = timeframe_in_seconds * number
+        res = {'rateInfos': []}
+        while len(res['rateInfos']) < number:
+            res = await self.get_chart_last_request(
+                symbol,
+                timeframe_in_seconds // 60,
+                time.time() - sec_prior
+            )
+            res['rateInfos'] = res['rateInfos'][-number:]
+            sec_prior *= 3
+        candle_history = []
+        for candle in res['rateInfos']:
+            _pr = candle['open']
+            candle_history.append({
+                'timestamp': candle['ctm'] / 1000,
+                'open': _pr / 10 ** res['digits'],
+                'close': (_pr + candle['close']) / 10 ** res['digits'],
+                'high': (_pr + candle['high']) / 10 ** res['digits'],
+                'low': (_pr + candle['low']) / 10 ** res['digits'],
+                'volume': candle['vol']
+            })
+        return candle_history
+
+    async def update_trades(self):
+        """update trade list"""
+        trades = await self.get_trades()
+        self.trade_rec.clear()
+        for trade in trades:
+            obj_trans = Transaction(trade)
+            self.trade_rec[obj_trans.order_id] = obj_trans
+        self.LOGGER.info(f"updated {len(self.trade_rec)} trades")
+        return self.trade_rec
+
+    async def get_trade_profit(self, trans_id):
+        """get profit of trade"""
+        await self.update_trades()
+        profit = self.trade_rec[trans_id].actual_profit
+        self.LOGGER.info(f"got trade profit of {profit}")
+        return profit
+
+    async def open_trade(self, mode, symbol, volume, **kwargs):
+        """open trade transaction"""
+        mode_enum = _get_mode_enum(mode)
+        mode_value = mode_enum.value
+        self.LOGGER.info(f"opening trade of {symbol} of {volume} with {mode_enum.name}")
+        conversion_mode = {MODES.BUY.value: 'ask', MODES.SELL.value: 'bid'}
+        res_symbol = await self.get_symbol(symbol)
+        price = res_symbol[conversion_mode[mode_value]]
+        tp, sl = _safeguard_prices(mode_value, price, res_symbol['precision'], kwargs)
+        response = await self.trade_transaction(symbol, mode_value, 0, volume,
+                                                price=price, take_profit=tp, stop_loss=sl)
+        await self.update_trades()
+        status = (await self.trade_transaction_status(response['order']))['requestStatus']
+        self.LOGGER.info(f"open_trade completed with status of {status}")
+        if status != 3:
+            raise TransactionRejected(status)
+        return response
+
+    async def close_trade_only(self, order_id):
+        """faster but less secure"""
+        trade = self.trade_rec[order_id]
+        self.LOGGER.debug(f"closing trade {order_id}")
+        try:
+            response = await self.trade_transaction(
+                trade.symbol, 0, 2, trade.volume, order=trade.order_id,
+                price=trade.price)
+        except CommandFailed as e:
+            if e.err_code == 'BE51':  # order already closed
+                self.LOGGER.debug("BE51 error code noticed")
+                return 'BE51'
+            else:
+                raise
+        status = (await self.trade_transaction_status(response['order']))['requestStatus']
+        self.LOGGER.debug(f"close_trade completed with status of {status}")
+        if status != 3:
+            raise TransactionRejected(status)
+        return response
+
+    async def close_trade(self, trans):
+        """close trade transaction"""
+        if isinstance(trans, Transaction):
+            order_id = trans.order_id
+        else:
+            order_id = trans
+        await self.update_trades()
+        return await self.close_trade_only(order_id)
+
+    async def close_all_trades(self):
+        """close all trades"""
+        await self.update_trades()
+        self.LOGGER.debug(f"closing {len(self.trade_rec)} trades")
+        await asyncio.gather(*[
+            self.close_trade_only(trade_id) for trade_id in list(self.trade_rec)
+        ])
+
+    async def get_market_status(self, list_of_symbols):
+        """check if market status is open for symbol in symbols"""
+        if not self.hours.known(list_of_symbols):
+            self.hours.load(await self.get_trading_hours(list_of_symbols))
+        return self.hours.status(list_of_symbols)
@@ -0,0 +1,79 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.codec
+~~~~~~~
+
+JSON codec module, fastest available backend with stdlib fallback
+"""
+
+import json
+import logging
+import reprlib
+
+LOGGER = logging.getLogger('XTBApi.codec')
+# payloads logged at DEBUG are cut to this many items per container
+MAX_LOG_ITEMS = 10
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+if orjson is not None:
+    BACKEND = 'orjson'
+
+    def dumps(data):
+        """serialize to str (text frame)"""
+        return orjson.dumps(data).decode()
+
+    def loads(frame):
+        """deserialize str or bytes frame"""
+        return orjson.loads(frame)
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+    _encoder = msgspec.json.Encoder()
+    _decoder = msgspec.json.Decoder()
+
+    def dumps(data):
+        """serialize to str (text frame)"""
+        return _encoder.encode(data).decode()
+
+    def loads(frame):
+        """deserialize str or bytes frame"""
+        return _decoder.decode(frame)
+else:
+    BACKEND = 'json'
+
+    def dumps(data):
+        """serialize to str (text frame)"""
+        return json.dumps(data)
+
+    def loads(frame):
+        """deserialize str or bytes frame"""
+        return json.loads(frame)
+
+
+LOGGER.debug(f"json backend: {BACKEND}")
+
+
+_repr = reprlib.Repr()
+_repr.maxlevel = 4
+_repr.maxlist = _repr.maxdict = MAX_LOG_ITEMS
+_repr.maxstring = _repr.maxother = 80
+
+
+class LazyPayload(object):
+    """payload rendered for logging only when the record is emitted,
+    containers cut to MAX_LOG_ITEMS items"""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __str__(self):
+        return _repr.repr(self.data)
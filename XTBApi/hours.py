@@ -0,0 +1,116 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.hours
+~~~~~~~
+
+Trading hours module, weekly schedule per symbol with O(log n) lookup
+"""
+
+import threading
+import time
+from bisect import bisect_right
+import logging
+
+LOGGER = logging.getLogger('XTBApi.hours')
+DAY = 86_400
+WEEK = 7 * DAY
+HOURS_TTL = DAY
+# 1970-01-01 (epoch 0) was a Thursday, 3 days after a Monday
+_EPOCH_WEEKDAY = 3
+
+
+def _sec_of_week(ts):
+    """seconds since Monday 00:00 of timestamp ts (s)"""
+    return (int(ts) + _EPOCH_WEEKDAY * DAY) % WEEK
+
+
+def week_intervals(trading):
+    """sorted, merged [start, end] seconds-of-week from getTradingHours
+    'trading' sessions (day 1=Monday, fromT/toT in s from midnight)"""
+    intervals = sorted(
+        [(mkt['day'] - 1) * DAY + mkt['fromT'], (mkt['day'] - 1) * DAY + mkt['toT']]
+        for mkt in trading
+    )
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+class TradingHours(object):
+    """weekly trading schedule per symbol
+
+    Built from getTradingHours, refreshed after ttl, and kept in backend
+    (any object with get_key/set_key like classes.cache.Cache) so that a
+    run can decide if markets are open before it connects."""
+
+    def __init__(self, backend=None, ttl=HOURS_TTL, key='xtb_trading_hours'):
+        self.backend = backend
+        self.ttl = ttl
+        self.key = key
+        self._intervals = {}
+        self._starts = {}
+        self._time_loaded = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        return time.time() - self._time_loaded > self.ttl
+
+    def _index(self, intervals):
+        with self._lock:
+            self._intervals.update(intervals)
+            self._starts.update({s: [i[0] for i in v] for s, v in intervals.items()})
+            self._time_loaded = time.time()
+
+    def _load_backend(self):
+        if self.backend is None:
+            return False
+        try:
+            cached = self.backend.get_key(self.key)
+        except Exception as e:
+            LOGGER.debug(f"trading hours not in backend: {e}")
+            return False
+        self._index(cached)
+        return True
+
+    def load(self, response):
+        """index getTradingHours response (fromT/toT in s)"""
+        intervals = {res['symbol']: week_intervals(res['trading']) for res in response}
+        self._index(intervals)
+        if self.backend is not None:
+            try:
+                self.backend.set_key(self.key, self._intervals, ttl_s=self.ttl)
+            except Exception as e:
+                LOGGER.warning(e)
+        return intervals
+
+    def refresh(self, client, list_of_symbols):
+        """download schedule of symbols"""
+        LOGGER.info(f"refresh trading hours of {list_of_symbols}")
+        return self.load(client.get_trading_hours(list_of_symbols))
+
+    def known(self, list_of_symbols):
+        """True if a fresh schedule exists for every symbol"""
+        if self.stale:
+            self._load_backend()
+        return not self.stale and all(s in self._starts for s in list_of_symbols)
+
+    def week(self, symbol):
+        """merged [start, end] seconds-of-week of symbol, [] if unknown"""
+        return self._intervals.get(symbol, [])
+
+    def is_open(self, symbol, ts=None):
+        """True if symbol trades at timestamp ts (s, default now)"""
+        sec = _sec_of_week(time.time() if ts is None else ts)
+        starts = self._starts.get(symbol, [])
+        i = bisect_right(starts, sec) - 1
+        return i >= 0 and sec <= self._intervals[symbol][i][1]
+
+    def status(self, list_of_symbols, ts=None):
+        """{symbol: is_open}"""
+        return {s: self.is_open(s, ts) for s in list_of_symbols}
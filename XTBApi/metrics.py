@@ -0,0 +1,132 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.metrics
+~~~~~~~
+
+Instrumentation module, per-command latency histograms and counters
+"""
+
+import threading
+from collections import defaultdict
+
+# upper bounds in seconds, +Inf bucket is implicit
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram(object):
+    """cumulative-bucket histogram, as exposed by Prometheus"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        cumulative, total = {}, 0
+        for bound, n in zip(self.buckets, self.counts):
+            total += n
+            cumulative[bound] = total
+        return {'buckets': cumulative, 'sum': self.sum, 'count': self.count}
+
+
+class Metrics(object):
+    """where the time of a client goes
+
+    latency: network round trip per command, decode: JSON decode per command,
+    throttle: time slept by the rate limiter, plus bytes and retry counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = defaultdict(Histogram)
+        self.decode = defaultdict(Histogram)
+        self.requests = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.retries = defaultdict(int)
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.throttle_seconds = 0.0
+        self.throttle_count = 0
+        self.relogins = 0
+
+    def observe_command(self, command, seconds, bytes_out, bytes_in):
+        with self._lock:
+            self.latency[command].observe(seconds)
+            self.requests[command] += 1
+            self.bytes_out += bytes_out
+            self.bytes_in += bytes_in
+
+    def observe_decode(self, command, seconds):
+        with self._lock:
+            self.decode[command].observe(seconds)
+
+    def observe_throttle(self, seconds):
+        if seconds <= 0:
+            return
+        with self._lock:
+            self.throttle_seconds += seconds
+            self.throttle_count += 1
+
+    def inc_error(self, command):
+        with self._lock:
+            self.errors[command] += 1
+
+    def inc_retry(self, command):
+        with self._lock:
+            self.retries[command] += 1
+
+    def inc_relogin(self):
+        with self._lock:
+            self.relogins += 1
+
+    def snapshot(self):
+        """plain dict of every metric"""
+        with self._lock:
+            return {
+                'latency': {c: h.snapshot() for c, h in self.latency.items()},
+                'decode': {c: h.snapshot() for c, h in self.decode.items()},
+                'requests': dict(self.requests),
+                'errors': dict(self.errors),
+                'retries': dict(self.retries),
+                'bytes_out': self.bytes_out,
+                'bytes_in': self.bytes_in,
+                'throttle_seconds': self.throttle_seconds,
+                'throttle_count': self.throttle_count,
+                'relogins': self.relogins,
+            }
+
+    def prometheus(self, prefix='xtbapi'):
+        """Prometheus text exposition format"""
+        snap = self.snapshot()
+        lines = []
+        for name, help_text in (('latency', 'command round trip seconds'),
+                                ('decode', 'response decode seconds')):
+            metric = f'{prefix}_command_{name}_seconds'
+            lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+            for command, hist in sorted(snap[name].items()):
+                for bound, n in hist['buckets'].items():
+                    lines.append(f'{metric}_bucket{{command="{command}",le="{bound}"}} {n}')
+                lines.append(f'{metric}_bucket{{command="{command}",le="+Inf"}} {hist["count"]}')
+                lines.append(f'{metric}_sum{{command="{command}"}} {hist["sum"]}')
+                lines.append(f'{metric}_count{{command="{command}"}} {hist["count"]}')
+        for name in ('requests', 'errors', 'retries'):
+            metric = f'{prefix}_command_{name}_total'
+            lines += [f'# HELP {metric} command {name}', f'# TYPE {metric} counter']
+            for command, n in sorted(snap[name].items()):
+                lines.append(f'{metric}{{command="{command}"}} {n}')
+        for name, value in (('bytes_out', snap['bytes_out']), ('bytes_in', snap['bytes_in']),
+                            ('throttle_seconds', snap['throttle_seconds']),
+                            ('throttle', snap['throttle_count']), ('relogins', snap['relogins'])):
+            metric = f'{prefix}_{name}_total'
+            lines += [f'# TYPE {metric} counter', f'{metric} {value}']
+        return '\n'.join(lines) + '\n'
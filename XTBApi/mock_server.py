@@ -0,0 +1,293 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.mock_server
+~~~~~~~
+
+Local mock of the xAPI websocket server, for offline runs and benchmarks
+
+    python -m XTBApi.mock_server --port 8765 --latency 0.05
+    XTB_HOST=ws://localhost:8765 python app.py
+"""
+
+import argparse
+import itertools
+import random
+import threading
+import time
+from websockets.sync.server import serve
+from websockets.exceptions import WebSocketException
+from XTBApi.codec import dumps, loads
+import logging
+
+LOGGER = logging.getLogger('XTBApi.mock_server')
+DEFAULT_DIGITS = {'EURUSD': 5, 'USDJPY': 3, 'SILVER': 3}
+
+
+def _ok(return_data=None, **fields):
+    res = {"status": True}
+    if return_data is not None:
+        res['returnData'] = return_data
+    res.update(fields)
+    return res
+
+
+def _error(code, descr):
+    return {"status": False, "errorCode": code, "errorDescr": descr}
+
+
+class MockServer(object):
+    """xAPI JSON protocol over websocket, for the commands BaseClient uses
+
+    latency: seconds added before every response
+    errors: {command: errorCode} answered with status false (e.g. BE51)
+    drop_every: close the socket on every n-th request (0: never)
+    drop_next: close the socket on the next request only
+    market_open: trading hours open all week, or closed all week
+    sessions: [(fromT, toT)] in s of every day while open, whole days by default"""
+
+    def __init__(self, host='localhost', port=0, latency=0.0, errors=None,
+                 drop_every=0, market_open=True, seed=0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.errors = dict(errors or {})
+        self.drop_every = drop_every
+        self.drop_next = False
+        self.market_open = market_open
+        self.sessions = [(0, 86_400)]
+        self.seed = seed
+        self.n_requests = 0
+        self.n_logins = 0
+        self.trades = {}
+        self._orders = itertools.count(1000)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._stopped = threading.Event()
+        self._connections = set()
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    # synthetic data
+    def digits(self, symbol):
+        return DEFAULT_DIGITS.get(symbol, 2)
+
+    def rate_infos(self, symbol, period, start, end, ticks):
+        """random walk candles of symbol, deterministic by ctm"""
+        period_ms = period * 60_000
+        end = end or int(time.time() * 1000)
+        last = end - end % period_ms
+        if ticks < 0:
+            ctms = [last - i * period_ms for i in range(-ticks - 1, -1, -1)]
+        elif ticks > 0:
+            first = start - start % period_ms
+            ctms = [first + i * period_ms for i in range(ticks)]
+        else:
+            first = start - start % period_ms
+            ctms = list(range(first, last + 1, period_ms))
+        scale = 10 ** self.digits(symbol)
+        candles = []
+        for ctm in ctms:
+            rnd = random.Random(f"{self.seed}:{symbol}:{period}:{ctm}")
+            _op = int(scale * (100 + rnd.uniform(-1, 1)))
+            _cl = rnd.randint(-scale // 10, scale // 10)
+            candles.append({
+                'ctm': ctm,
+                'ctmString': time.strftime('%b %d, %Y, %I:%M:%S %p', time.gmtime(ctm / 1000)),
+                'open': float(_op),
+                'close': float(_cl),
+                'high': float(max(_cl, 0) + rnd.randint(0, scale // 20)),
+                'low': float(min(_cl, 0) - rnd.randint(0, scale // 20)),
+                'vol': float(rnd.randint(1, 1000)),
+            })
+        return candles
+
+    def symbol(self, symbol):
+        digits = self.digits(symbol)
+        last = self.rate_infos(symbol, 1, 0, 0, -1)[-1]
+        bid = (last['open'] + last['close']) / 10 ** digits
+        spread = 2 / 10 ** digits
+        return {'symbol': symbol, 'precision': digits, 'bid': bid,
+                'ask': round(bid + spread, digits), 'contractSize': 100_000,
+                'currency': 'USD', 'categoryName': 'FX', 'lotMin': 0.01,
+                'lotStep': 0.01, 'lotMax': 100.0}
+
+    def trading_hours(self, symbols):
+        hours = [{'day': day, 'fromT': start * 1000, 'toT': end * 1000}
+                 for day in range(1, 8) for start, end in self.sessions]
+        hours = hours if self.market_open else []
+        return [{'symbol': s, 'quotes': hours, 'trading': hours} for s in symbols]
+
+    # protocol
+    def handle(self, request, session):
+        """response of one request"""
+        command = request.get('command')
+        args = request.get('arguments', {})
+        if command in self.errors:
+            return _error(self.errors[command], f"injected error on {command}")
+        if command == 'login':
+            session['logged'] = True
+            with self._lock:
+                self.n_logins += 1
+            return _ok(streamSessionId='mock-stream-session')
+        if not session['logged']:
+            return _error('BE103', 'User is not logged')
+        if command == 'logout':
+            session['logged'] = False
+            return _ok()
+        if command == 'ping':
+            return _ok()
+        if command in ('getChartRangeRequest', 'getChartLastRequest'):
+            info = args['info']
+            symbol = info['symbol']
+            rate_infos = self.rate_infos(symbol, info['period'], int(info['start']),
+                                         int(info.get('end', 0)), int(info.get('ticks', 0)))
+            return _ok({'digits': self.digits(symbol), 'rateInfos': rate_infos})
+        if command == 'getSymbol':
+            return _ok(self.symbol(args['symbol']))
+        if command == 'getAllSymbols':
+            return _ok([self.symbol(s) for s in ('EURUSD', 'USDJPY', 'GOLD', 'OIL.WTI', 'BITCOIN')])
+        if command == 'getTradingHours':
+            return _ok(self.trading_hours(args['symbols']))
+        if command == 'getTrades':
+            with self._lock:
+                return _ok(list(self.trades.values()))
+        if command == 'getTradeRecords':
+            with self._lock:
+                return _ok([t for o, t in self.trades.items() if o in args['orders']])
+        if command == 'tradeTransaction':
+            return self.trade_transaction(args['tradeTransInfo'])
+        if command == 'tradeTransactionStatus':
+            return _ok({'order': args['order'], 'requestStatus': 3, 'message': None,
+                        'ask': 0.0, 'bid': 0.0, 'customComment': ''})
+        if command == 'getServerTime':
+            now = int(time.time() * 1000)
+            return _ok({'time': now, 'timeString': time.ctime(now / 1000)})
+        if command == 'getVersion':
+            return _ok({'version': 'mock'})
+        if command == 'getCurrentUserData':
+            return _ok({'currency': 'USD', 'leverage': 1, 'companyUnit': 0})
+        if command == 'getMarginLevel':
+            return _ok({'balance': 10_000.0, 'equity': 10_000.0, 'margin': 0.0,
+                        'margin_free': 10_000.0, 'margin_level': 0.0, 'currency': 'USD'})
+        if command in ('getCalendar', 'getTradesHistory', 'getTickPrices'):
+            return _ok({'quotations': []} if command == 'getTickPrices' else [])
+        if command in ('getCommissionDef', 'getMarginTrade', 'getProfitCalculation'):
+            return _ok({'commission': 0.0, 'margin': 0.0, 'profit': 0.0, 'rateOfExchange': 1.0})
+        return _error('EX000', f"mock does not know {command}")
+
+    def trade_transaction(self, info):
+        with self._lock:
+            if info['type'] == 0:
+                order = next(self._orders)
+                self.trades[order] = {
+                    'order': order, 'order2': order, 'position': order,
+                    'cmd': info['cmd'], 'symbol': info['symbol'],
+                    'volume': info['volume'], 'open_price': info['price'],
+                    'close_price': info['price'], 'sl': info['sl'], 'tp': info['tp'],
+                    'profit': 0.0, 'open_time': int(time.time() * 1000),
+                    'closed': False, 'customComment': info.get('customComment', ''),
+                }
+                return _ok({'order': order})
+            if info['type'] == 2:
+                if self.trades.pop(info.get('order'), None) is None:
+                    return _error('BE51', 'Order already closed')
+                return _ok({'order': next(self._orders)})
+        return _ok({'order': next(self._orders)})
+
+    def _serve_connection(self, websocket):
+        session = {'logged': False}
+        with self._lock:
+            self._connections.add(websocket)
+        try:
+            for message in websocket:
+                request = loads(message)
+                with self._lock:
+                    self.n_requests += 1
+                    n_requests = self.n_requests
+                    drop = self.drop_next or (self.drop_every and n_requests % self.drop_every == 0)
+                    self.drop_next = False
+                if drop:
+                    LOGGER.debug(f"drop socket at request {n_requests}")
+                    websocket.close_socket()  # abrupt, like a lost connection
+                    return
+                if self.latency:
+                    time.sleep(self.latency)
+                response = self.handle(request, session)
+                if 'customTag' in request:
+                    response['customTag'] = request['customTag']
+                websocket.send(dumps(response))
+        except WebSocketException as e:
+            LOGGER.debug(f"connection closed: {e}")
+        finally:
+            with self._lock:
+                self._connections.discard(websocket)
+
+    def _serve_forever(self):
+        """accept loop of WebSocketServer.serve_forever, with daemon handler threads"""
+        listener = self._server.socket
+        while not self._stopped.is_set():
+            try:
+                sock, addr = listener.accept()
+            except TimeoutError:
+                continue
+            except OSError:
+                break
+            threading.Thread(target=self._server.handler, args=(sock, addr), daemon=True).start()
+
+    def start(self):
+        """serve in background thread, return self"""
+        self._stopped.clear()
+        self._server = serve(self._serve_connection, self.host, self.port)
+        self._server.socket.settimeout(0.1)
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve_forever, daemon=True)
+        self._thread.start()
+        LOGGER.info(f"mock server on {self.url}")
+        return self
+
+    def stop(self):
+        """stop accepting, close the listening socket and every open connection"""
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+        if self._thread is not None:
+            self._thread.join()
+        with self._lock:
+            connections = list(self._connections)
+        for websocket in connections:
+            websocket.close_socket()
+        self._server = self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mock xAPI server")
+    parser.add_argument('--host', default='localhost')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--drop-every', type=int, default=0)
+    parser.add_argument('--error', action='append', default=[],
+                        help="command=errorCode, e.g. tradeTransaction=BE51")
+    parser.add_argument('--closed', action='store_true', help="market closed all week")
+    args = parser.parse_args()
+    server = MockServer(args.host, args.port, latency=args.latency,
+                        errors=dict(e.split('=', 1) for e in args.error),
+                        drop_every=args.drop_every, market_open=not args.closed)
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
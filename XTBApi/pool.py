@@ -0,0 +1,62 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.pool
+~~~~~~~
+
+Session pool module, reuse logged-in clients across runs
+"""
+
+import threading
+from XTBApi.api import Client, STATUS, LOGIN_TIMEOUT
+from XTBApi.exceptions import *
+import logging
+
+LOGGER = logging.getLogger('XTBApi.pool')
+# ping idle sessions well before the server drops them
+KEEP_ALIVE = LOGIN_TIMEOUT // 4
+
+
+class SessionPool(object):
+    """pool of logged-in clients keyed by (user_id, mode)
+
+    get() hands out an authenticated client, logging in only on first use.
+    The supervisor of each pooled client pings it when idle longer than
+    keep_alive; the client re-authenticates by itself only when the server
+    rejects the session."""
+
+    def __init__(self, factory=None, keep_alive=KEEP_ALIVE):
+        self.factory = factory if factory is not None else (lambda user_id: Client())
+        self.keep_alive = keep_alive
+        self._sessions = {}
+        self._lock = threading.Lock()
+        LOGGER.debug("SessionPool inited")
+
+    def get(self, user_id, password, mode='demo'):
+        """logged-in client of account"""
+        key = (user_id, mode)
+        with self._lock:
+            client = self._sessions.get(key)
+            if client is None or client.status == STATUS.NOT_LOGGED:
+                client = client or self.factory(user_id)
+                client.login(user_id, password, mode=mode)
+                client.supervisor.ping_interval = self.keep_alive
+                client.supervisor.start()
+                self._sessions[key] = client
+                LOGGER.info(f"session opened for {user_id} ({mode})")
+            return client
+
+    def close(self):
+        """logout every session"""
+        with self._lock:
+            for (user_id, mode), client in self._sessions.items():
+                client.supervisor.stop()
+                try:
+                    client.logout()
+                except (CommandFailed, SocketError) as e:
+                    LOGGER.warning(e)
+                LOGGER.info(f"session closed for {user_id} ({mode})")
+            self._sessions.clear()
+
+    def __len__(self):
+        return len(self._sessions)
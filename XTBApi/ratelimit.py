@@ -0,0 +1,55 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.ratelimit
+~~~~~~~
+
+Rate limiter module, token bucket shared by the commands of a client
+"""
+
+import threading
+import time
+import logging
+
+LOGGER = logging.getLogger('XTBApi.ratelimit')
+# the server allows one request per 200 ms, with short bursts tolerated
+MAX_RATE = 5.0
+MAX_BURST = 5
+
+
+class TokenBucket(object):
+    """in-process token bucket
+
+    rate: tokens refilled per second, capacity: burst size.
+    reserve() takes tokens at once (the level may go negative) and returns
+    the seconds the caller has to wait, so concurrent callers queue up in
+    order instead of all sleeping a fixed interval."""
+
+    def __init__(self, rate=MAX_RATE, capacity=MAX_BURST):
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be > 0 and capacity >= 1")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._level = float(capacity)
+        self._time_last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        """take tokens, return seconds to wait before using them"""
+        with self._lock:
+            now = time.monotonic()
+            self._level = min(self.capacity,
+                              self._level + (now - self._time_last) * self.rate)
+            self._time_last = now
+            self._level -= tokens
+            if self._level >= 0:
+                return 0.0
+            return -self._level / self.rate
+
+    def acquire(self, tokens=1):
+        """take tokens, sleep until they are available, return slept seconds"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            LOGGER.debug(f"throttled {wait:.3f} s.")
+            time.sleep(wait)
+        return wait
@@ -0,0 +1,290 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.stream
+~~~~~~~
+
+Streaming module, subscribe on the xAPI stream session
+"""
+
+import threading
+import time
+from collections import deque
+from websockets.sync.client import connect
+from websockets.exceptions import WebSocketException
+from XTBApi.api import XTB_HOST
+from XTBApi.exceptions import *
+from XTBApi.codec import dumps, loads, LazyPayload
+import logging
+
+LOGGER = logging.getLogger('XTBApi.stream')
+LOGGER.setLevel(logging.INFO)
+PING_INTERVAL = 30
+CANDLE_BUFFER = 400
+
+
+def _get_stream_data(command, stream_session_id, **parameters):
+    data = {
+        "command": command,
+        "streamSessionId": stream_session_id,
+    }
+    data.update(parameters)
+    return data
+
+
+def _to_rate_info(candle, digits, period):
+    """convert stream candle (absolute prices) into rateInfos format
+    (open in points, close/high/low as delta from open)"""
+    scale = 10 ** digits
+    _op = round(candle['open'] * scale)
+    period_ms = period * 60_000
+    return {
+        'ctm': candle['ctm'] - candle['ctm'] % period_ms,
+        'open': _op,
+        'close': round(candle['close'] * scale) - _op,
+        'high': round(candle['high'] * scale) - _op,
+        'low': round(candle['low'] * scale) - _op,
+        'vol': candle['vol'],
+    }
+
+
+def _aggregate(ctm, minutes):
+    """bar of ctm from its M1 rateInfos candles {ctm: candle}"""
+    candles = [minutes[m] for m in sorted(minutes)]
+    _op = candles[0]['open']
+    return {
+        'ctm': ctm,
+        'open': _op,
+        'close': candles[-1]['open'] + candles[-1]['close'] - _op,
+        'high': max(c['open'] + c['high'] for c in candles) - _op,
+        'low': min(c['open'] + c['low'] for c in candles) - _op,
+        'vol': sum(c['vol'] for c in candles),
+    }
+
+
+class CandleStore(object):
+    """in-memory ring buffer of candles per (symbol, period)
+
+    Seeded with the closed candles of getChartRangeRequest rateInfos, then
+    kept current by the M1 candles of the stream. A bar is built by the
+    stream only from its first minute on; a bar the stream joined midway is
+    missing until a later seed brings it, and the buffer is not ready().
+    Bars lost while the stream was down are not seen, reset() the symbols of
+    a stream that is reopened. Bars are aligned on UTC, as XTB bars up to H1."""
+
+    def __init__(self, maxlen=CANDLE_BUFFER):
+        self.maxlen = maxlen
+        self._lock = threading.Lock()
+        self._series = {}
+        self._digits = {}
+        self._minutes = {}
+        self._missing = {}
+        LOGGER.debug("CandleStore inited")
+
+    def register(self, symbol, period, digits=None):
+        """start buffering symbol for period"""
+        with self._lock:
+            self._series.setdefault((symbol, period), deque(maxlen=self.maxlen))
+            if digits is not None:
+                self._digits[symbol] = digits
+
+    def seed(self, symbol, period, rate_infos, digits, now_ms=None):
+        """merge the closed rateInfos candles (as from chart requests) into the buffer,
+        the bar in progress is left to the stream"""
+        closed_ms = (now_ms or time.time() * 1000) - period * 60_000
+        key = (symbol, period)
+        with self._lock:
+            series = self._series.setdefault(key, deque(maxlen=self.maxlen))
+            merged = {c['ctm']: c for c in series}
+            merged.update({c['ctm']: dict(c) for c in rate_infos if c['ctm'] <= closed_ms})
+            series.clear()
+            series.extend(merged[ctm] for ctm in sorted(merged)[-self.maxlen:])
+            self._missing[key] = {ctm for ctm in self._missing.get(key, ())
+                                  if ctm not in merged and ctm > series[0]['ctm']} if series else set()
+            self._digits[symbol] = digits
+
+    def reset(self, symbols):
+        """forget the buffered bars of symbols, kept registered until the next seed"""
+        with self._lock:
+            for key in [k for k in self._series if k[0] in symbols]:
+                self._series[key].clear()
+                self._minutes.pop(key, None)
+                self._missing.pop(key, None)
+
+    def add_candle(self, candle):
+        """fold one stream (M1) candle into the bar of every period of its symbol"""
+        symbol = candle['symbol']
+        with self._lock:
+            digits = self._digits.get(symbol)
+            if digits is None:
+                LOGGER.debug(f"no digits for {symbol}, candle dropped")
+                return
+            minute = _to_rate_info(candle, digits, 1)
+            for key, series in self._series.items():
+                if key[0] != symbol:
+                    continue
+                period_ms = key[1] * 60_000
+                ctm = minute['ctm'] - minute['ctm'] % period_ms
+                bar = self._minutes.get(key)
+                if bar is None or bar[0] != ctm:
+                    if series and series[-1]['ctm'] >= ctm:
+                        continue  # bar closed, already in the buffer
+                    if minute['ctm'] != ctm:
+                        # joined midway, the minutes before are unknown
+                        self._missing.setdefault(key, set()).add(ctm)
+                        self._minutes.pop(key, None)
+                        continue
+                    bar = self._minutes[key] = (ctm, {})
+                bar[1][minute['ctm']] = minute
+                if series and series[-1]['ctm'] == ctm:
+                    series[-1] = _aggregate(ctm, bar[1])
+                else:
+                    series.append(_aggregate(ctm, bar[1]))
+
+    def ready(self, symbol, period, since_ctm=None):
+        """buffer holds maxlen candles, or reaches back to since_ctm, and none was missed by the stream"""
+        key = (symbol, period)
+        with self._lock:
+            series = self._series.get(key, ())
+            if since_ctm is None:
+                full = len(series) >= self.maxlen
+            else:
+                full = bool(series) and series[0]['ctm'] <= since_ctm
+            return full and not self._missing.get(key)
+
+    def rate_infos(self, symbol, period):
+        """list copy of buffered candles, oldest first"""
+        with self._lock:
+            return [dict(c) for c in self._series.get((symbol, period), ())]
+
+    def digits(self, symbol, default=None):
+        return self._digits.get(symbol, default)
+
+    def __len__(self):
+        return sum(len(s) for s in self._series.values())
+
+
+class StreamClient(object):
+    """client of the xAPI streaming port
+
+    Needs the streamSessionId returned by login of BaseClient/Client.
+    With ticks (XTBApi.ticks.TickAggregator), tick prices are also folded
+    into bars. Pass tick_prices=client.tick_prices to price the market
+    orders of Client.open_trade from the stream."""
+
+    def __init__(self, stream_session_id, store=None, host=None, ticks=None, tick_prices=None):
+        self.ws = None
+        self.host = host or XTB_HOST
+        self.stream_session_id = stream_session_id
+        self.store = store if store is not None else CandleStore()
+        self.tick_prices = tick_prices if tick_prices is not None else {}
+        self.ticks = ticks
+        self.candle_symbols = set()
+        self.tick_symbols = set()
+        self.trades = {}
+        self.on_trade = []
+        self.time_keep_alive = 0.0
+        self._thread = None
+        self._running = False
+        self.LOGGER = logging.getLogger('XTBApi.stream.StreamClient')
+
+    def _send(self, dict_data):
+        try:
+            self.ws.send(dumps(dict_data))
+        except WebSocketException:
+            raise SocketError()
+
+    def _dispatch(self, res):
+        command = res.get('command')
+        data = res.get('data', {})
+        if command == 'candle':
+            self.store.add_candle(data)
+        elif command == 'tickPrices':
+            self.tick_prices[data['symbol']] = data
+            if self.ticks is not None:
+                self.ticks.add_tick(data)
+        elif command == 'trade':
+            self.trades[data['order']] = data
+            for callback in self.on_trade:
+                callback(data)
+        elif command == 'keepAlive':
+            self.time_keep_alive = time.time()
+        else:
+            self.LOGGER.debug("%s", LazyPayload(res))
+
+    def _run(self):
+        try:
+            while self._running:
+                try:
+                    message = self.ws.recv(timeout=PING_INTERVAL)
+                except TimeoutError:
+                    self.ping()
+                    continue
+                self._dispatch(loads(message))
+        except (WebSocketException, SocketError) as e:
+            # closed by the server, or found dead on ping
+            self.LOGGER.warning(f"stream closed: {e}")
+        except Exception as e:
+            # a message that cannot be read, the stream is reopened
+            self.LOGGER.exception(f"stream stopped: {e}")
+        finally:
+            self._running = False
+
+    def connect(self, mode='demo'):
+        """open stream socket and start reading in background"""
+        self.ws = connect(f"{self.host}/{mode}Stream")
+        self._running = True
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.LOGGER.info("STREAM: connected...")
+
+    @property
+    def alive(self):
+        """whether the stream socket is still being read"""
+        return self._running and self._thread is not None and self._thread.is_alive()
+
+    def close(self):
+        """stop reading and close stream socket"""
+        self._running = False
+        if self.ws is not None:
+            self.ws.close()
+        if self._thread is not None:
+            self._thread.join(timeout=PING_INTERVAL)
+        self.LOGGER.info("STREAM: closed...")
+
+    def subscribe_candles(self, symbol, period=None, digits=None):
+        """getCandles subscription (M1 candles), buffered for period"""
+        if period is not None:
+            self.store.register(symbol, period, digits)
+        if symbol in self.candle_symbols:
+            return
+        self.candle_symbols.add(symbol)
+        self._send(_get_stream_data("getCandles", self.stream_session_id,
+                                    symbol=symbol))
+        self.LOGGER.info(f"STREAM: subscribe candles of {symbol}...")
+
+    def subscribe_tick_prices(self, symbol, min_arrival_time=0, max_level=0):
+        """getTickPrices subscription"""
+        if symbol in self.tick_symbols:
+            return
+        self.tick_symbols.add(symbol)
+        self._send(_get_stream_data("getTickPrices", self.stream_session_id,
+                                    symbol=symbol,
+                                    minArrivalTime=min_arrival_time,
+                                    maxLevel=max_level))
+        self.LOGGER.info(f"STREAM: subscribe tick prices of {symbol}...")
+
+    def subscribe_trades(self):
+        """getTrades subscription"""
+        self._send(_get_stream_data("getTrades", self.stream_session_id))
+        self.LOGGER.info("STREAM: subscribe trades...")
+
+    def subscribe_keep_alive(self):
+        """getKeepAlive subscription"""
+        self._send(_get_stream_data("getKeepAlive", self.stream_session_id))
+        self.LOGGER.info("STREAM: subscribe keep alive...")
+
+    def ping(self):
+        """ping command of stream session"""
+        self._send(_get_stream_data("ping", self.stream_session_id))
+        self.LOGGER.debug("STREAM: ping...")
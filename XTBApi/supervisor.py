@@ -0,0 +1,95 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.supervisor
+~~~~~~~
+
+Connection supervisor module, keep-alive and backoff reconnect of a client
+"""
+
+import random
+import threading
+import time
+from XTBApi.exceptions import *
+import logging
+
+LOGGER = logging.getLogger('XTBApi.supervisor')
+PING_INTERVAL = 30
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 60
+MAX_ATTEMPTS = 8
+# commands that must not be sent twice when the first send may have landed
+NON_IDEMPOTENT = ('tradeTransaction',)
+
+
+class Supervisor(object):
+    """keeps the session of one client healthy
+
+    reconnect() re-authenticates with jittered exponential backoff; callers
+    that failed on the same session generation share one re-login.
+    start() pings in background whenever the client has been idle."""
+
+    def __init__(self, client, ping_interval=PING_INTERVAL, base_delay=BACKOFF_BASE,
+                 max_delay=BACKOFF_MAX, max_attempts=MAX_ATTEMPTS):
+        self.client = client
+        self.ping_interval = ping_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_attempts = max_attempts
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reconnect(self, generation):
+        """re-login unless another caller already did since generation"""
+        with self._lock:
+            if generation != self.generation:
+                return self.generation
+            for attempt in range(self.max_attempts):
+                # full jitter: uniform in [0, base * 2^attempt], capped
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+                self._close()
+                try:
+                    self.client.login(*self.client._login_data)
+                except Exception as e:
+                    LOGGER.warning(f"reconnect attempt {attempt + 1} failed: {e}")
+                    continue
+                self.generation += 1
+                self.client.metrics.inc_relogin()
+                LOGGER.info(f"reconnected after {attempt + 1} attempt(s)")
+                return self.generation
+        raise SocketError()
+
+    def _close(self):
+        """close the socket of the lost session, login opens a new one"""
+        if self.client.ws is None:
+            return
+        try:
+            self.client.ws.close()
+        except Exception as e:
+            LOGGER.debug(f"closing lost socket: {e}")
+
+    def _keep_alive(self):
+        while not self._stop.wait(self.ping_interval):
+            if time.time() - self.client.time_last_command < self.ping_interval:
+                continue
+            try:
+                self.client.ping()
+            except Exception as e:
+                LOGGER.warning(f"keep-alive ping failed: {e}")
+
+    def start(self):
+        """ping in background thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._keep_alive, daemon=True)
+        self._thread.start()
+        LOGGER.debug("keep-alive started")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._thread = None
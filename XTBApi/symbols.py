@@ -0,0 +1,86 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.symbols
+~~~~~~~
+
+Symbol metadata module, static fields of getAllSymbols cached with TTL
+"""
+
+import threading
+import time
+import logging
+
+LOGGER = logging.getLogger('XTBApi.symbols')
+SYMBOL_TTL = 86_400
+# fields of SYMBOL_RECORD that do not move with the market
+STATIC_FIELDS = ('symbol', 'description', 'categoryName', 'groupName', 'currency',
+                 'currencyProfit', 'precision', 'pipsPrecision', 'contractSize',
+                 'lotMin', 'lotMax', 'lotStep', 'tickSize', 'tickValue',
+                 'leverage', 'stopsLevel', 'type', 'instantMaxVolume')
+
+
+def _static(symbol_record):
+    return {k: symbol_record[k] for k in STATIC_FIELDS if k in symbol_record}
+
+
+class SymbolCache(object):
+    """static symbol metadata, filled by one getAllSymbols
+
+    Kept in process, and in backend (any object with get_key/set_key like
+    classes.cache.Cache) so that other processes skip the download."""
+
+    def __init__(self, backend=None, ttl=SYMBOL_TTL, key='xtb_symbols'):
+        self.backend = backend
+        self.ttl = ttl
+        self.key = key
+        self._symbols = {}
+        self._time_loaded = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        return time.time() - self._time_loaded > self.ttl
+
+    def _load_backend(self):
+        if self.backend is None:
+            return False
+        try:
+            cached = self.backend.get_key(self.key)
+        except Exception as e:
+            LOGGER.debug(f"symbols not in backend: {e}")
+            return False
+        self._symbols = cached
+        self._time_loaded = time.time()
+        LOGGER.debug(f"loaded {len(cached)} symbols from backend")
+        return True
+
+    def refresh(self, client):
+        """bulk prefetch with getAllSymbols"""
+        symbols = {s['symbol']: _static(s) for s in client.get_all_symbols()}
+        with self._lock:
+            self._symbols = symbols
+            self._time_loaded = time.time()
+        if self.backend is not None:
+            try:
+                self.backend.set_key(self.key, symbols, ttl_s=self.ttl)
+            except Exception as e:
+                LOGGER.warning(e)
+        LOGGER.info(f"cached {len(symbols)} symbols")
+        return symbols
+
+    def update(self, symbol_record):
+        """keep static fields of a getSymbol response"""
+        with self._lock:
+            self._symbols[symbol_record['symbol']] = _static(symbol_record)
+
+    def get(self, symbol, client=None):
+        """static metadata of symbol, None if unknown
+        client: used to refresh when stale and not found in backend"""
+        if self.stale and not self._load_backend() and client is not None:
+            self.refresh(client)
+        return self._symbols.get(symbol)
+
+    def digits(self, symbol, default=None, client=None):
+        """price precision of symbol"""
+        return (self.get(symbol, client) or {}).get('precision', default)
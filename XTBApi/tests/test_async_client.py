@@ -0,0 +1,86 @@
+"""
+tests.test_async_client.py
+~~~~~~~
+
+test the asyncio client offline, against the local mock server
+"""
+
+import asyncio
+import logging
+import time
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from XTBApi.api import Client
+from XTBApi.async_api import AsyncClient
+from XTBApi.mock_server import MockServer
+from XTBApi.ratelimit import TokenBucket
+from XTBApi.tests.test_mock_server import _sessions_around_now
+
+LOGGER = logging.getLogger('XTBApi.test_async_client')
+SYMBOLS = ['EURUSD', 'USDJPY', 'GOLD', 'SILVER', 'OIL.WTI']
+
+
+class _Server(MockServer):
+    """mock server rejecting getSymbol of UNKNOWN"""
+
+    def handle(self, request, session):
+        if request.get('command') == 'getSymbol' and request['arguments']['symbol'] == 'UNKNOWN':
+            return {"status": False, "errorCode": 'BE115', "errorDescr": 'Unknown symbol'}
+        return super().handle(request, session)
+
+
+@pytest.fixture
+def _get_server():
+    with _Server() as server:
+        yield server
+
+
+def _run(server, coro_func):
+    async def session():
+        client = AsyncClient(limiter=TokenBucket(1000, 1000), host=server.url)
+        await client.login('mock', 'mock')
+        try:
+            return await coro_func(client)
+        finally:
+            await client.logout()
+    return asyncio.run(session())
+
+
+def test_requests_in_flight(_get_server):
+    now = int(time.time())
+    res = _run(_get_server, lambda c: c.get_chart_range_requests(SYMBOLS, 15, now, now, -10))
+    assert list(res) == SYMBOLS
+    assert all(len(r['rateInfos']) == 10 for r in res.values())
+    LOGGER.debug("passed")
+
+
+def test_socket_drop_single_relogin(_get_server):
+    async def dropped(client):
+        _get_server.drop_next = True
+        return await client.get_symbols(SYMBOLS)
+    res = _run(_get_server, dropped)
+    assert list(res) == SYMBOLS
+    assert _get_server.n_logins == 2
+    LOGGER.debug("passed")
+
+
+def test_errors_isolated_per_symbol(_get_server):
+    res = _run(_get_server, lambda c: c.get_symbols(['EURUSD', 'UNKNOWN', 'GOLD']))
+    assert list(res) == ['EURUSD', 'GOLD']
+    assert _get_server.n_logins == 1
+    LOGGER.debug("passed")
+
+
+def test_market_status_as_sync_client(_get_server):
+    _get_server.sessions = _sessions_around_now()
+    res = _run(_get_server, lambda c: c.check_if_market_open(SYMBOLS))
+    client = Client(limiter=TokenBucket(1000, 1000), host=_get_server.url)
+    client.login('mock', 'mock')
+    try:
+        assert res == client.check_if_market_open(SYMBOLS) == {s: True for s in SYMBOLS}
+    finally:
+        client.logout()
+    LOGGER.debug("passed")
@@ -0,0 +1,29 @@
+"""
+tests.test_codec.py
+~~~~~~~
+
+test the json codec
+"""
+
+import logging
+
+from XTBApi.codec import dumps, loads, LazyPayload, MAX_LOG_ITEMS
+
+LOGGER = logging.getLogger('XTBApi.test_codec')
+
+
+def test_roundtrip_str_and_bytes():
+    data = {"command": "getSymbol", "arguments": {"symbol": "EURUSD"}}
+    frame = dumps(data)
+    assert isinstance(frame, str)
+    assert loads(frame) == data
+    assert loads(frame.encode()) == data
+    LOGGER.debug("passed")
+
+
+def test_lazy_payload_is_capped():
+    payload = {'digits': 5, 'rateInfos': [{'ctm': i} for i in range(10_000)]}
+    text = str(LazyPayload(payload))
+    assert text.count("'ctm'") == MAX_LOG_ITEMS
+    assert text.endswith('...]}')
+    LOGGER.debug("passed")
@@ -0,0 +1,73 @@
+"""
+tests.test_hours.py
+~~~~~~~
+
+test the weekly trading hours index
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from XTBApi.hours import TradingHours, week_intervals, DAY
+
+LOGGER = logging.getLogger('XTBApi.test_hours')
+HOUR = 3600
+# two sessions on Monday, Friday ends early, overnight Tue->Wed
+RESPONSE = [{
+    'symbol': 'GOLD',
+    'quotes': [],
+    'trading': [
+        {'day': 1, 'fromT': 1 * HOUR, 'toT': 12 * HOUR},
+        {'day': 1, 'fromT': 13 * HOUR, 'toT': 22 * HOUR},
+        {'day': 2, 'fromT': 20 * HOUR, 'toT': DAY},
+        {'day': 3, 'fromT': 0, 'toT': 2 * HOUR},
+        {'day': 5, 'fromT': 1 * HOUR, 'toT': 20 * HOUR},
+    ],
+}]
+
+
+def _ts(day, hour, minute=0):
+    # 2024-01-01 was a Monday
+    return datetime(2024, 1, day, hour, minute, tzinfo=timezone.utc).timestamp()
+
+
+class _Backend:
+    def __init__(self):
+        self.data = {}
+
+    def set_key(self, key, value, **kwargs):
+        self.data[key] = value
+
+    def get_key(self, key):
+        return self.data[key]
+
+
+def test_week_intervals_merge_overnight():
+    merged = week_intervals(RESPONSE[0]['trading'])
+    assert [DAY + 20 * HOUR, 2 * DAY + 2 * HOUR] in merged
+    assert len(merged) == 4
+    LOGGER.debug("passed")
+
+
+def test_is_open():
+    hours = TradingHours()
+    hours.load(RESPONSE)
+    assert hours.is_open('GOLD', _ts(1, 2))
+    assert not hours.is_open('GOLD', _ts(1, 12, 30))
+    assert hours.is_open('GOLD', _ts(1, 14))  # second session of the day
+    assert hours.is_open('GOLD', _ts(3, 1))
+    assert not hours.is_open('GOLD', _ts(6, 10))  # weekend
+    assert not hours.is_open('EURUSD', _ts(1, 2))  # unknown symbol
+    assert hours.week('GOLD')[0] == [1 * HOUR, 12 * HOUR]
+    assert hours.week('EURUSD') == []
+    LOGGER.debug("passed")
+
+
+def test_backend_shared():
+    backend = _Backend()
+    TradingHours(backend=backend).load(RESPONSE)
+    hours = TradingHours(backend=backend)
+    assert hours.known(['GOLD'])
+    assert not hours.known(['GOLD', 'EURUSD'])
+    assert hours.status(['GOLD'], _ts(5, 19)) == {'GOLD': True}
+    LOGGER.debug("passed")
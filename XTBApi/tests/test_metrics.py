@@ -0,0 +1,47 @@
+"""
+tests.test_metrics.py
+~~~~~~~
+
+test the client instrumentation
+"""
+
+import logging
+
+from XTBApi.metrics import Metrics
+
+LOGGER = logging.getLogger('XTBApi.test_metrics')
+
+
+def _get_metrics():
+    metrics = Metrics()
+    metrics.observe_command('getSymbol', 0.02, 60, 800)
+    metrics.observe_command('getSymbol', 0.3, 60, 800)
+    metrics.observe_decode('getSymbol', 0.001)
+    metrics.observe_throttle(0.15)
+    metrics.observe_throttle(0.0)
+    metrics.inc_retry('getSymbol')
+    metrics.inc_relogin()
+    metrics.inc_error('tradeTransaction')
+    return metrics
+
+
+def test_snapshot():
+    snap = _get_metrics().snapshot()
+    hist = snap['latency']['getSymbol']
+    assert hist['count'] == 2
+    assert hist['buckets'][0.025] == 1
+    assert hist['buckets'][0.5] == 2
+    assert snap['bytes_in'] == 1600
+    assert snap['throttle_count'] == 1
+    assert snap['retries'] == {'getSymbol': 1}
+    assert snap['relogins'] == 1
+    assert snap['errors'] == {'tradeTransaction': 1}
+    LOGGER.debug("passed")
+
+
+def test_prometheus():
+    text = _get_metrics().prometheus()
+    assert 'xtbapi_command_latency_seconds_bucket{command="getSymbol",le="+Inf"} 2' in text
+    assert 'xtbapi_command_requests_total{command="getSymbol"} 2' in text
+    assert 'xtbapi_throttle_seconds_total 0.15' in text
+    LOGGER.debug("passed")
@@ -0,0 +1,155 @@
+"""
+tests.test_mock_server.py
+~~~~~~~
+
+test the api client offline, against the local mock server
+"""
+
+import logging
+import time
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from XTBApi.api import Client
+from XTBApi.exceptions import CommandFailed, SocketError
+from XTBApi.mock_server import MockServer
+from websockets.exceptions import WebSocketException
+
+LOGGER = logging.getLogger('XTBApi.test_mock_server')
+DEFAULT_CURRENCY = 'EURUSD'
+
+
+@pytest.fixture
+def _get_server():
+    with MockServer() as server:
+        yield server
+
+
+@pytest.fixture
+def _get_client(_get_server):
+    client = Client(host=_get_server.url)
+    client.supervisor.base_delay = 0.01
+    client.login('mock', 'mock')
+    yield client
+    client.logout()
+
+
+def test_login(_get_client):
+    client = _get_client
+    assert client.stream_session_id == 'mock-stream-session'
+    LOGGER.debug("passed")
+
+
+def test_get_chart_range_request(_get_client):
+    client = _get_client
+    now = int(time.time())
+    res = client.get_chart_range_request(DEFAULT_CURRENCY, 15, now, now, -100)
+    assert res['digits'] == 5
+    assert len(res['rateInfos']) == 100
+    ctms = [c['ctm'] for c in res['rateInfos']]
+    assert ctms == sorted(ctms)
+    LOGGER.debug("passed")
+
+
+def test_open_close_trade(_get_client):
+    client = _get_client
+    response = client.open_trade('buy', DEFAULT_CURRENCY, 0.1)
+    assert response['order'] in client.update_trades()
+    client.close_trade(response['order'])
+    assert not client.update_trades()
+    LOGGER.debug("passed")
+
+
+def test_market_status(_get_client):
+    client = _get_client
+    assert client.get_market_status([DEFAULT_CURRENCY]) == {DEFAULT_CURRENCY: True}
+    LOGGER.debug("passed")
+
+
+def _sessions_around_now():
+    """two sessions a day, now in the second one or, early in the day, in the first"""
+    sec = int(time.time()) % 86_400
+    if sec >= 7200:
+        return [(0, sec - 3600), (sec - 1800, 86_400)]
+    return [(0, sec + 1800), (sec + 3600, 86_400)]
+
+
+def test_market_status_several_sessions(_get_server, _get_client):
+    _get_server.sessions = _sessions_around_now()
+    symbols = [DEFAULT_CURRENCY, 'GOLD']
+    assert _get_client.check_if_market_open(symbols) == {s: True for s in symbols}
+    assert _get_client.get_market_status(symbols) == {s: True for s in symbols}
+    LOGGER.debug("passed")
+
+
+def test_error_injection(_get_server, _get_client):
+    _get_server.errors['getSymbol'] = 'EX001'
+    with pytest.raises(CommandFailed):
+        _get_client.get_symbol(DEFAULT_CURRENCY)
+    LOGGER.debug("passed")
+
+
+def test_socket_drop_relogin(_get_server, _get_client):
+    _get_server.drop_next = True
+    _get_client.get_server_time()
+    assert _get_server.n_logins == 2
+    LOGGER.debug("passed")
+
+
+def test_no_replay_of_trade_transaction(_get_server, _get_client):
+    client = _get_client
+    price = client.get_symbol(DEFAULT_CURRENCY)['ask']
+    _get_server.drop_next = True
+    with pytest.raises(SocketError):
+        client.trade_transaction(DEFAULT_CURRENCY, 0, 0, 0.1, price=price)
+    assert _get_server.n_logins == 2
+    assert not client.get_trades()
+    snap = client.metrics.snapshot()
+    assert snap['relogins'] == 1
+    assert 'tradeTransaction' not in snap['retries']
+    LOGGER.debug("passed")
+
+
+def test_open_trade_order_path(_get_client):
+    client = _get_client
+    client.symbols.refresh(client)
+    client.tick_prices[DEFAULT_CURRENCY] = {'symbol': DEFAULT_CURRENCY, 'ask': 1.2, 'bid': 1.1998,
+                                            'timestamp': time.time() * 1000}
+    client.open_trade('buy', DEFAULT_CURRENCY, 0.1)
+    assert 'getSymbol' not in client.metrics.snapshot()['requests']
+    # stale tick: priced by getSymbol
+    client.tick_prices[DEFAULT_CURRENCY]['timestamp'] -= 60_000
+    client.open_trade('buy', DEFAULT_CURRENCY, 0.1)
+    assert client.metrics.snapshot()['requests']['getSymbol'] == 1
+    LOGGER.debug("passed")
+
+
+def test_reconnect_closes_lost_socket(_get_server, _get_client):
+    client = _get_client
+    lost = client.ws
+    client.supervisor.reconnect(client.supervisor.generation)
+    with pytest.raises(WebSocketException):
+        lost.send('{}')
+    assert client.ws is not lost and client.get_server_time()
+    LOGGER.debug("passed")
+
+
+def test_no_replay_after_unexpected_error(_get_server, _get_client):
+    client = _get_client
+    price = client.get_symbol(DEFAULT_CURRENCY)['ask']
+    send_command = client._send_command
+
+    def landed_then_failed(dict_data):
+        response = send_command(dict_data)
+        if dict_data['command'] == 'tradeTransaction':
+            raise ValueError("unexpected")
+        return response
+    client._send_command = landed_then_failed
+    with pytest.raises(ValueError):
+        client.trade_transaction(DEFAULT_CURRENCY, 0, 0, 0.1, price=price)
+    client._send_command = send_command
+    assert _get_server.n_logins == 2
+    assert len(client.get_trades()) == 1
+    LOGGER.debug("passed")
@@ -0,0 +1,58 @@
+"""
+tests.test_pool.py
+~~~~~~~
+
+test the session pool, against the local mock server
+"""
+
+import logging
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from XTBApi.api import Client, STATUS
+from XTBApi.mock_server import MockServer
+from XTBApi.pool import SessionPool
+
+LOGGER = logging.getLogger('XTBApi.test_pool')
+
+
+@pytest.fixture
+def _get_server():
+    with MockServer() as server:
+        yield server
+
+
+@pytest.fixture
+def _get_pool(_get_server):
+    pool = SessionPool(factory=lambda user_id: Client(host=_get_server.url))
+    yield pool
+    pool.close()
+
+
+def test_session_reused(_get_server, _get_pool):
+    client = _get_pool.get('mock', 'mock')
+    assert _get_pool.get('mock', 'mock') is client
+    assert _get_pool.get('other', 'mock') is not client
+    assert len(_get_pool) == 2
+    assert _get_server.n_logins == 2
+    LOGGER.debug("passed")
+
+
+def test_logged_out_session_renewed(_get_server, _get_pool):
+    client = _get_pool.get('mock', 'mock')
+    client.logout()
+    assert client.status == STATUS.NOT_LOGGED
+    assert _get_pool.get('mock', 'mock').status == STATUS.LOGGED
+    assert _get_server.n_logins == 2
+    assert client.get_server_time()
+    LOGGER.debug("passed")
+
+
+def test_close(_get_pool):
+    client = _get_pool.get('mock', 'mock')
+    _get_pool.close()
+    assert len(_get_pool) == 0
+    assert client.status == STATUS.NOT_LOGGED
+    LOGGER.debug("passed")
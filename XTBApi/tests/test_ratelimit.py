@@ -0,0 +1,46 @@
+"""
+tests.test_ratelimit.py
+~~~~~~~
+
+test the token bucket rate limiter
+"""
+
+import logging
+import time
+
+import pytest
+
+from XTBApi.ratelimit import TokenBucket
+
+LOGGER = logging.getLogger('XTBApi.test_ratelimit')
+
+
+def test_burst_without_wait():
+    bucket = TokenBucket(rate=5, capacity=5)
+    waits = [bucket.reserve() for _ in range(5)]
+    assert waits == [0.0] * 5
+    LOGGER.debug("passed")
+
+
+def test_wait_after_burst():
+    bucket = TokenBucket(rate=5, capacity=5)
+    for _ in range(5):
+        bucket.reserve()
+    assert bucket.reserve() == pytest.approx(0.2, abs=0.02)
+    assert bucket.reserve() == pytest.approx(0.4, abs=0.02)
+    LOGGER.debug("passed")
+
+
+def test_acquire_sleeps_only_when_needed():
+    bucket = TokenBucket(rate=50, capacity=1)
+    start = time.monotonic()
+    assert bucket.acquire() == 0.0
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.015
+    LOGGER.debug("passed")
+
+
+def test_invalid_bucket():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+    LOGGER.debug("passed")
@@ -0,0 +1,121 @@
+"""
+tests.test_stream.py
+~~~~~~~
+
+test the live candle buffer of the stream
+"""
+
+import logging
+import threading
+
+import pytest
+
+pytest.importorskip("websockets")
+
+from websockets.exceptions import ConnectionClosedError
+from XTBApi.stream import CandleStore, StreamClient
+
+LOGGER = logging.getLogger('XTBApi.test_stream')
+MINUTE = 60_000
+NOW = 100 * 15 * MINUTE + 7 * MINUTE
+
+
+def _rate_info(ctm, open_, close=0, high=0, low=0, vol=1.0):
+    return {'ctm': ctm, 'open': open_, 'close': close, 'high': high, 'low': low, 'vol': vol}
+
+
+def _candle(ctm, open_, close, high, low, vol=1.0, symbol='EURUSD'):
+    """stream candle, absolute prices"""
+    return {'symbol': symbol, 'ctm': ctm, 'open': open_, 'close': close,
+            'high': high, 'low': low, 'vol': vol}
+
+
+def test_seed_closed_candles():
+    store = CandleStore(maxlen=3)
+    bars = [_rate_info(i * 15 * MINUTE, 100_000 + i) for i in range(96, 101)]
+    store.seed('EURUSD', 15, bars, 5, now_ms=NOW)
+    # the bar in progress (ctm 100) is left to the stream, the oldest fall off
+    assert [c['ctm'] // (15 * MINUTE) for c in store.rate_infos('EURUSD', 15)] == [97, 98, 99]
+    assert store.ready('EURUSD', 15)
+    store.seed('EURUSD', 15, [_rate_info(99 * 15 * MINUTE, 1)], 5, now_ms=NOW)
+    assert store.rate_infos('EURUSD', 15)[-1]['open'] == 1
+    LOGGER.debug("passed")
+
+
+def test_stream_bar_from_its_first_minute():
+    store = CandleStore(maxlen=3)
+    store.seed('EURUSD', 15, [_rate_info(i * 15 * MINUTE, 100_000) for i in range(97, 100)], 5,
+               now_ms=100 * 15 * MINUTE)
+    start = 100 * 15 * MINUTE
+    store.add_candle(_candle(start, 1.0, 1.0002, 1.0003, 0.9999, vol=5))
+    store.add_candle(_candle(start + MINUTE, 1.0002, 1.0001, 1.0005, 1.0, vol=7))
+    store.add_candle(_candle(start + MINUTE, 1.0002, 1.0001, 1.0005, 1.0, vol=7))  # repeated minute
+    bar = store.rate_infos('EURUSD', 15)[-1]
+    assert bar == {'ctm': start, 'open': 100_000, 'close': 10, 'high': 50, 'low': -10, 'vol': 12}
+    LOGGER.debug("passed")
+
+
+def test_stream_joined_midway():
+    store = CandleStore(maxlen=3)
+    store.seed('EURUSD', 15, [_rate_info(i * 15 * MINUTE, 100_000) for i in range(97, 100)], 5, now_ms=NOW)
+    store.add_candle(_candle(NOW, 1.0, 1.0, 1.0, 1.0))
+    # bar 100 is missing its first minutes, the next one is built whole
+    store.add_candle(_candle(101 * 15 * MINUTE, 1.0, 1.0, 1.0, 1.0))
+    assert [c['ctm'] // (15 * MINUTE) for c in store.rate_infos('EURUSD', 15)] == [98, 99, 101]
+    assert not store.ready('EURUSD', 15)
+    store.seed('EURUSD', 15, [_rate_info(100 * 15 * MINUTE, 100_000)], 5, now_ms=NOW + 15 * MINUTE)
+    assert [c['ctm'] // (15 * MINUTE) for c in store.rate_infos('EURUSD', 15)] == [99, 100, 101]
+    assert store.ready('EURUSD', 15)
+    LOGGER.debug("passed")
+
+
+def test_reset_after_reconnect():
+    store = CandleStore(maxlen=3)
+    store.seed('EURUSD', 15, [_rate_info(i * 15 * MINUTE, 100_000) for i in range(97, 100)], 5, now_ms=NOW)
+    assert store.ready('EURUSD', 15, since_ctm=98 * 15 * MINUTE)
+    assert not store.ready('EURUSD', 15, since_ctm=96 * 15 * MINUTE)
+    # bars 100 and 101 were lost while the stream was down
+    store.reset({'EURUSD'})
+    store.add_candle(_candle(102 * 15 * MINUTE, 1.0, 1.0, 1.0, 1.0))
+    assert not store.ready('EURUSD', 15, since_ctm=99 * 15 * MINUTE)
+    store.seed('EURUSD', 15, [_rate_info(i * 15 * MINUTE, 100_000) for i in range(99, 102)], 5,
+               now_ms=103 * 15 * MINUTE)
+    assert [c['ctm'] // (15 * MINUTE) for c in store.rate_infos('EURUSD', 15)] == [100, 101, 102]
+    assert store.ready('EURUSD', 15, since_ctm=101 * 15 * MINUTE)
+    LOGGER.debug("passed")
+
+
+class _Socket:
+    """stream socket timing out on recv, with a message or a failing send"""
+
+    def __init__(self, messages=(), send_error=None):
+        self.messages = list(messages)
+        self.send_error = send_error
+
+    def recv(self, timeout=None):
+        if self.messages:
+            return self.messages.pop(0)
+        raise TimeoutError
+
+    def send(self, data):
+        if self.send_error is not None:
+            raise self.send_error
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize('socket', [
+    _Socket(send_error=ConnectionClosedError(None, None)),  # dead on ping
+    _Socket(messages=['{"command": "candle", "data": {}}']),  # unreadable candle
+])
+def test_stream_not_alive_once_reading_stops(socket):
+    stream = StreamClient('session')
+    stream.ws = socket
+    stream._running = True
+    stream._thread = threading.Thread(target=stream._run, daemon=True)
+    stream._thread.start()
+    stream._thread.join(timeout=5)
+    assert not stream._thread.is_alive()
+    assert not stream.alive
+    LOGGER.debug("passed")
@@ -0,0 +1,65 @@
+"""
+tests.test_symbols.py
+~~~~~~~
+
+test the symbol metadata cache
+"""
+
+import logging
+import time
+
+from XTBApi.symbols import SymbolCache
+
+LOGGER = logging.getLogger('XTBApi.test_symbols')
+
+
+class _Client(object):
+    """getAllSymbols of a client, counted"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_all_symbols(self):
+        self.calls += 1
+        return [{'symbol': 'EURUSD', 'precision': 5, 'contractSize': 100_000, 'bid': 1.1, 'ask': 1.1002}]
+
+
+class _Backend(object):
+    """get_key/set_key of classes.cache.Cache, in a dict"""
+
+    def __init__(self):
+        self.values = {}
+
+    def get_key(self, key):
+        if key not in self.values:
+            raise TypeError("the JSON object must be str, bytes or bytearray, not NoneType")
+        return self.values[key]
+
+    def set_key(self, key, value, ttl_s=None):
+        self.values[key] = value
+
+
+def test_expiry():
+    client = _Client()
+    cache = SymbolCache(ttl=60)
+    assert cache.digits('EURUSD', client=client) == 5
+    assert cache.get('EURUSD') == {'symbol': 'EURUSD', 'precision': 5, 'contractSize': 100_000}
+    cache.get('EURUSD', client)
+    assert client.calls == 1
+    cache._time_loaded = time.time() - 61
+    cache.get('EURUSD', client)
+    assert client.calls == 2
+    LOGGER.debug("passed")
+
+
+def test_backend_fallback():
+    backend, client = _Backend(), _Client()
+    # nothing in backend: the client downloads and fills the backend
+    assert SymbolCache(backend=backend).digits('EURUSD', client=client) == 5
+    assert client.calls == 1 and 'EURUSD' in backend.values['xtb_symbols']
+    # another process: read from backend, no download
+    assert SymbolCache(backend=backend).digits('EURUSD', client=client) == 5
+    assert client.calls == 1
+    # stale and unreachable: unknown without client, default kept
+    assert SymbolCache(backend=_Backend()).digits('EURUSD', default=2) == 2
+    LOGGER.debug("passed")
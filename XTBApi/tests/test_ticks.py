@@ -0,0 +1,44 @@
+"""
+tests.test_ticks.py
+~~~~~~~
+
+test the tick to bar aggregator
+"""
+
+import logging
+
+from XTBApi.ticks import TickAggregator
+
+LOGGER = logging.getLogger('XTBApi.test_ticks')
+
+
+def _tick(ts, bid, symbol='GOLD', level=0):
+    return {'symbol': symbol, 'timestamp': ts, 'bid': bid, 'ask': bid + 0.5, 'level': level}
+
+
+def test_bars_of_every_period():
+    agg = TickAggregator(periods=(10, 60))
+    done = []
+    agg.on_bar.append(done.append)
+    for ts, bid in [(0, 10.0), (3_000, 12.0), (9_000, 9.0), (12_000, 11.0)]:
+        agg.add_tick(_tick(ts, bid))
+    assert done == [{'symbol': 'GOLD', 'period': 10, 'ctm': 0, 'open': 10.0,
+                     'high': 12.0, 'low': 9.0, 'close': 9.0, 'vol': 3}]
+    minute = agg.current('GOLD', 60)
+    assert (minute['open'], minute['high'], minute['low'], minute['close'], minute['vol']) == \
+        (10.0, 12.0, 9.0, 11.0, 4)
+    assert agg.current('GOLD', 10)['ctm'] == 10_000
+    LOGGER.debug("passed")
+
+
+def test_flush_and_filters():
+    agg = TickAggregator(periods=(60,))
+    agg.add_tick(_tick(1_000, 10.0))
+    assert agg.add_tick(_tick(2_000, 99.0, level=1)) == []  # deeper book level
+    agg.add_tick(_tick(61_000, 11.0))
+    assert agg.add_tick(_tick(30_000, 50.0)) == []  # late tick of a completed bar
+    assert agg.flush(100_000) == []
+    flushed = agg.flush(120_000)
+    assert [(b['ctm'], b['close']) for b in flushed] == [(60_000, 11.0)]
+    assert agg.current('GOLD', 60) is None
+    LOGGER.debug("passed")
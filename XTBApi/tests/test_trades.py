@@ -0,0 +1,59 @@
+"""
+tests.test_trades.py
+~~~~~~~
+
+test the incremental trade store
+"""
+
+import logging
+
+from XTBApi.trades import TradeStore
+
+LOGGER = logging.getLogger('XTBApi.test_trades')
+
+
+class _Transaction(object):
+    built = 0
+
+    def __init__(self, trans_dict):
+        _Transaction.built += 1
+        self.order_id = trans_dict['order']
+        self.symbol = trans_dict['symbol']
+        self.mode = {0: 'buy', 1: 'sell'}[trans_dict['cmd']]
+        self.actual_profit = trans_dict['profit']
+
+
+def _trade(order, symbol='GOLD', cmd=0, profit=0.0):
+    return {'order': order, 'symbol': symbol, 'cmd': cmd, 'profit': profit}
+
+
+def test_sync_is_a_diff():
+    store = TradeStore(_Transaction)
+    store.sync([_trade(1), _trade(2, cmd=1)])
+    built = _Transaction.built
+    assert store.sync([_trade(1), _trade(2, cmd=1, profit=3.0), _trade(3)]) == 2
+    assert _Transaction.built - built == 2
+    assert store.sync([_trade(3)]) == 2
+    assert list(store.orders) == [3]
+    LOGGER.debug("passed")
+
+
+def test_index_by_symbol_mode():
+    store = TradeStore(_Transaction)
+    store.sync([_trade(1), _trade(2, cmd=1), _trade(3, symbol='EURUSD')])
+    assert [t.order_id for t in store.by_symbol('GOLD', 'sell')] == [2]
+    store.apply_event(dict(_trade(2, cmd=1), closed=True))
+    assert store.by_symbol('GOLD', 'sell') == []
+    store.apply_event(dict(_trade(4, cmd=1), closed=False))
+    assert [t.order_id for t in store.by_symbol('GOLD', 'sell')] == [4]
+    LOGGER.debug("passed")
+
+
+def test_staleness():
+    store = TradeStore(_Transaction, max_age=60)
+    assert store.stale
+    store.sync([])
+    assert not store.stale
+    store.invalidate()
+    assert store.stale
+    LOGGER.debug("passed")
@@ -0,0 +1,80 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.ticks
+~~~~~~~
+
+Tick aggregation module, OHLCV bars built from tick prices
+"""
+
+import threading
+import logging
+
+LOGGER = logging.getLogger('XTBApi.ticks')
+
+
+def _new_bar(symbol, period, start, price):
+    return {'symbol': symbol, 'period': period, 'ctm': start, 'open': price,
+            'high': price, 'low': price, 'close': price, 'vol': 1}
+
+
+class TickAggregator(object):
+    """bars of every period (s) for each symbol, folded tick by tick
+
+    Only the bar in progress is kept per (symbol, period): a tick costs one
+    update per period. Bars use absolute prices like stream candles, and
+    vol counts ticks. Completed bars go to the on_bar callbacks and are
+    returned by add_tick()/flush()."""
+
+    def __init__(self, periods=(60,), price='bid', level=0):
+        self.periods = tuple(periods)
+        self.price = price
+        self.level = level
+        self.on_bar = []
+        self._bars = {}
+        self._lock = threading.Lock()
+
+    def _complete(self, bars):
+        for bar in bars:
+            for callback in self.on_bar:
+                callback(bar)
+        return bars
+
+    def add_tick(self, tick):
+        """fold a getTickPrices record, return the bars it completed"""
+        if tick.get('level', 0) != self.level:
+            return []
+        symbol, ts, price = tick['symbol'], tick['timestamp'], tick[self.price]
+        completed = []
+        with self._lock:
+            for period in self.periods:
+                period_ms = period * 1000
+                start = ts - ts % period_ms
+                bar = self._bars.get((symbol, period))
+                if bar is None or bar['ctm'] < start:
+                    if bar is not None:
+                        completed.append(bar)
+                    self._bars[(symbol, period)] = _new_bar(symbol, period, start, price)
+                elif bar['ctm'] == start:
+                    bar['high'] = max(bar['high'], price)
+                    bar['low'] = min(bar['low'], price)
+                    bar['close'] = price
+                    bar['vol'] += 1
+                else:
+                    LOGGER.debug(f"late tick of {symbol} at {ts} dropped")
+        return self._complete(completed)
+
+    def flush(self, ts):
+        """complete the bars that ended by timestamp ts (ms), e.g. of idle symbols"""
+        with self._lock:
+            completed = [bar for (_, period), bar in self._bars.items()
+                         if bar['ctm'] + period * 1000 <= ts]
+            for bar in completed:
+                del self._bars[(bar['symbol'], bar['period'])]
+        return self._complete(completed)
+
+    def current(self, symbol, period):
+        """copy of the bar in progress, None if no tick yet"""
+        with self._lock:
+            bar = self._bars.get((symbol, period))
+            return dict(bar) if bar is not None else None
@@ -0,0 +1,85 @@
+# -*- coding utf-8 -*-
+
+"""
+XTBApi.trades
+~~~~~~~
+
+Trade state module, open trades kept up to date incrementally
+"""
+
+import threading
+import time
+from collections import defaultdict
+import logging
+
+LOGGER = logging.getLogger('XTBApi.trades')
+# a getTrades snapshot older than this is refreshed on next read
+TRADES_MAX_AGE = 5
+
+
+class TradeStore(object):
+    """open trades indexed by order id and by (symbol, mode)
+
+    sync() applies a getTrades snapshot as a diff, apply_event() a stream
+    trade record; only new or changed trades build a new Transaction."""
+
+    def __init__(self, transaction, max_age=TRADES_MAX_AGE):
+        self.transaction = transaction
+        self.max_age = max_age
+        self.orders = {}
+        self._records = {}
+        self._by_symbol = defaultdict(set)
+        self._time_synced = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def stale(self):
+        return time.time() - self._time_synced > self.max_age
+
+    def invalidate(self):
+        """force refresh on next read, e.g. after a trade transaction"""
+        self._time_synced = 0.0
+
+    def _put(self, record):
+        order_id = record['order']
+        if self._records.get(order_id) == record:
+            return False
+        self.discard(order_id)
+        trans = self.transaction(record)
+        self.orders[order_id] = trans
+        self._records[order_id] = record
+        self._by_symbol[(trans.symbol, trans.mode)].add(order_id)
+        return True
+
+    def discard(self, order_id):
+        """drop order from every index"""
+        with self._lock:
+            trans = self.orders.pop(order_id, None)
+            self._records.pop(order_id, None)
+            if trans is not None:
+                self._by_symbol[(trans.symbol, trans.mode)].discard(order_id)
+
+    def sync(self, trades):
+        """apply getTrades snapshot, return number of changed trades"""
+        with self._lock:
+            listed = {t['order'] for t in trades}
+            closed = [order_id for order_id in self.orders if order_id not in listed]
+            for order_id in closed:
+                self.discard(order_id)
+            changed = sum(self._put(t) for t in trades)
+            self._time_synced = time.time()
+        LOGGER.debug(f"sync: {changed} changed, {len(closed)} closed")
+        return changed + len(closed)
+
+    def apply_event(self, record):
+        """apply trade record of the stream (getTrades subscription)"""
+        with self._lock:
+            if record.get('closed') or record.get('state') == 'Deleted':
+                self.discard(record['order'])
+            elif record.get('cmd') in (0, 1):
+                self._put(record)
+
+    def by_symbol(self, symbol, mode):
+        """open trades of symbol in mode ('buy' or 'sell')"""
+        with self._lock:
+            return [self.orders[o] for o in self._by_symbol.get((symbol, mode), ())]
@@ -1,19 +1,32 @@
-import time
 from initial import settings, accounts, ind_presets
-from classes import Cache, Fx, Trade, Notify, Cloud, Profile, FXTYPE, FXMODE
+from classes import Cache, CandleSeries, MultiPresetEngine, IndicatorState, Trade, Notify, Cloud, Profile, FXTYPE, FXMODE, RedisTokenBucket
+from classes.resample import bucket_starts
 from XTBApi.api import Client
+from XTBApi.stream import CandleStore, StreamClient
+from XTBApi.pool import SessionPool
+from XTBApi.symbols import SymbolCache
+from XTBApi.hours import TradingHours
 from XTBApi.exceptions import CommandFailed
 from redis.exceptions import ConnectionError
 from datetime import datetime
 from pandas import DataFrame
 import logging
+import os
+import time
+# candles evaluated per cycle, and kept in cache
+CANDLE_WINDOW = 400
+# widest timeframe (min) read from the stream, its bars are aligned on UTC as XTB bars up to H1
+STREAM_TIMEFRAME = 60
+# epoch_ms of the last signal acted on per (mode, profile, symbol, preset), in process
+_last_signal = {}
 
 
 class Result:
-    def __init__(self, symbol: str, app: Profile, client: Client) -> None:
+    def __init__(self, symbol: str, app: Profile, client: Client, store: CandleStore = None) -> None:
         self.symbol = symbol
         self.app = app
         self.client = client
+        self.store = store
         self.market_status = False
         self.df = DataFrame()
         self.candles = DataFrame()
@@ -23,36 +36,69 @@ class Result:
         self.action = ''
         self.mode = ''
         self.inv_mode = ''
+        self.signals = {}
 
     def get_candles(self):
         logger = logging.getLogger(f'xtb.{self.app.name}')
         logger.setLevel(logging.DEBUG)
         x = self.app.param
-        # get charts
         now = int(datetime.now().timestamp())
-        res = self.client.get_chart_range_request(self.symbol, x.timeframe, now, now, -100) if self.client else {}
-        digits = res.get('digits', 5)
+        # a finer source series holds the window of the profile timeframe, and is kept as long
+        timeframe = x.source_timeframe or x.timeframe
+        length = CANDLE_WINDOW * x.timeframe // timeframe
+        series = CandleSeries(x.account.mode, self.symbol, timeframe, ttl_s=x.timeframe*172_800)
+        window_ctm = (now - x.timeframe*60*CANDLE_WINDOW) * 1000
+        # closed candles only, up to the one before the current bar: every read
+        # within the bar shares one in-process window
+        last_closed = int(bucket_starts([now * 1000], timeframe)[0]) - timeframe*60_000
+        try:
+            first_ctm, last_ctm = series.first_ctm(), series.last_ctm()
+        except ConnectionError as e:
+            logger.error(e)
+            first_ctm, last_ctm = 0, 0
+        streamed = (self.store is not None and timeframe <= STREAM_TIMEFRAME and 0 < last_ctm
+                    and first_ctm <= window_ctm and self.store.ready(self.symbol, timeframe, since_ctm=last_ctm))
+        if streamed:
+            # the stream buffer reaches back to the newest cached candle: no request
+            res = {'digits': self.store.digits(self.symbol),
+                   'rateInfos': [c for c in self.store.rate_infos(self.symbol, timeframe)
+                                 if last_ctm <= c['ctm'] <= last_closed]}
+        elif not self.client:
+            res = {}
+        elif first_ctm <= window_ctm < last_ctm:
+            # the newest cached candle may have been still forming, fetch it again
+            res = self.client.get_chart_range_request(self.symbol, timeframe, last_ctm // 1000, now, 0)
+        else:
+            # empty cache, a gap larger than the window or a shorter history: backfill the whole window
+            res = self.client.get_chart_range_request(self.symbol, timeframe, now, now, -length)
+        digits = res.get('digits') or (self.client.symbols.digits(self.symbol, 5) if self.client else 5)
         rate_infos = res.get('rateInfos', [])
-        logger.debug(f'recv {self.symbol} {len(rate_infos)} ticks.')
-        # caching
+        logger.debug(f'recv {self.symbol} {len(rate_infos)} ticks{" from stream" if streamed else ""}.')
+        if self.store is not None and not streamed and timeframe <= STREAM_TIMEFRAME:
+            # the stream goes on from the fetched candles
+            self.store.seed(self.symbol, timeframe, rate_infos, digits)
+        # caching, the archiver and the backtests read the series whether candles were fetched or streamed
         try:
-            cache = Cache()
-            key_group = f'{x.account.mode}_{self.symbol}_{x.timeframe}'
-            for ctm in rate_infos:
-                cache.set_key(f'{key_group}:{ctm["ctm"]}', ctm, ttl_s=x.timeframe*172_800)
-            ctm_prefix = range(((now - x.timeframe*60*400) // 100_000), (now // 100_000)+1)
-            rate_infos = []
-            for pre in ctm_prefix:
-                mkey = cache.client.keys(pattern=f'{key_group}:{pre}*')
-                rate_infos.extend(cache.get_keys(mkey))
+            series.write(rate_infos)
+            candles = DataFrame(series.window(last_closed, CANDLE_WINDOW, digits, timeframe=x.timeframe),
+                                copy=True)
         except ConnectionError as e:
             logger.error(e)
+            # without cache, only the fetched window of a native timeframe
+            return self._prepare_candles(rate_infos if timeframe == x.timeframe else [], digits, now)
+        logger.debug(f'got {self.symbol} {len(candles)} ticks.')
+        self.candles = candles
+        self.digits = digits
+        return candles
+
+    def _prepare_candles(self, rate_infos, digits, now):
+        logger = logging.getLogger(f'xtb.{self.app.name}')
+        x = self.app.param
         # prepare candles
-        if not rate_infos:
+        if not len(rate_infos):
             return DataFrame()
-        rate_infos = [c for c in rate_infos if now - int(c['ctm'])/1000 > x.timeframe*60]
-        rate_infos.sort(key=lambda by: by['ctm'])
         candles = DataFrame(rate_infos)
+        candles = candles[now - candles['ctm']/1000 > x.timeframe*60].sort_values('ctm', ignore_index=True)
         candles['close'] = (candles['open'] + candles['close']) / 10 ** digits
         candles['high'] = (candles['open'] + candles['high']) / 10 ** digits
         candles['low'] = (candles['open'] + candles['low']) / 10 ** digits
@@ -62,14 +108,37 @@ class Result:
         self.digits = digits
         return candles
 
-    def gen_signal(self, preset):
+    def gen_signals(self, presets):
+        """evaluate presets in one pass, indicators they share are computed once"""
         x = self.app.param
+        self.signals = {}
         if not len(self.candles):
             return False
-        # evaluate
-        fx = Fx(indicator=x.indicator, tech=ind_presets.get(preset))
-        fx.evaluate(self.candles)
-        self.df = fx.df
+        # evaluate incrementally, from the state saved by the last run when it is within the window
+        techs = {preset: ind_presets.get(preset) for preset in presets}
+        state = IndicatorState(x.account.mode, self.symbol, x.timeframe, '+'.join(presets))
+        try:
+            engine = state.load(MultiPresetEngine(x.indicator, techs))
+        except ConnectionError as e:
+            logging.getLogger(f'xtb.{self.app.name}').error(e)
+            engine = MultiPresetEngine(x.indicator, techs)
+        if engine.last_ctm < self.candles['ctm'].iloc[0]:
+            engine = MultiPresetEngine(x.indicator, techs)
+        for candle in self.candles[self.candles['ctm'] > engine.last_ctm].to_dict('records'):
+            engine.update(candle)
+        try:
+            state.save(engine)
+        except ConnectionError as e:
+            logging.getLogger(f'xtb.{self.app.name}').error(e)
+        self.signals = {preset: list(signal.rows) for preset, signal in engine.signals.items()}
+        return True
+
+    def gen_signal(self, preset):
+        if preset not in self.signals:
+            self.gen_signals([preset])
+        if not self.signals.get(preset):
+            return False
+        self.df = DataFrame(self.signals[preset])
         self.price = self.df.iloc[-1]['close']
         self.epoch_ms = self.df.iloc[-1]['ctm']
         self.action = FXTYPE(self.df.iloc[-1]['fx_type']).name.lower()
@@ -78,7 +147,43 @@ class Result:
         return True
 
 
-def run(app):
+def new_client(user_id: str) -> Client:
+    """Client rate limited per account, with symbol metadata shared through Redis."""
+    return Client(limiter=RedisTokenBucket(user_id), symbols=SymbolCache(backend=Cache()),
+                  hours=TradingHours(backend=Cache()))
+
+
+def first_signal(app, symbol: str, preset: str, epoch_ms: int) -> bool:
+    """True the first time the signal of the bar at epoch_ms is seen, across runs and processes"""
+    key = (app.param.account.mode, app.name, symbol, preset)
+    if _last_signal.get(key, 0) >= epoch_ms:
+        return False
+    _last_signal[key] = epoch_ms
+    try:
+        return bool(Cache().client.set('signal:' + '_'.join(key) + f'_{int(epoch_ms)}', 1,
+                                       nx=True, ex=app.param.timeframe * 120))
+    except ConnectionError as e:
+        logging.getLogger(f'xtb.{app.name}').error(e)
+        return True
+
+
+def open_stream(client: Client, store: CandleStore, streams: dict, mode: str) -> StreamClient:
+    """stream of the client session feeding store, reopened after a re-login or a drop"""
+    stream = streams.get(id(client))
+    if stream is None or stream.stream_session_id != client.stream_session_id or not stream.alive:
+        if stream is not None:
+            stream.close()
+            # bars streamed while it was down are lost, the next cycle fetches them again
+            store.reset(stream.candle_symbols)
+        stream = StreamClient(client.stream_session_id, store=store, host=client.host,
+                              tick_prices=client.tick_prices)
+        stream.connect(mode)
+        stream.subscribe_keep_alive()
+        streams[id(client)] = stream
+    return stream
+
+
+def run(app, pool: SessionPool = None, store: CandleStore = None, streams: dict = None):
     logger = logging.getLogger(f'xtb.{app.name}')
     x = app.param
     # init chat notification
@@ -93,14 +198,29 @@ def run(app):
     if not x.breaker and not x.signal:
         logger.debug('Breaker is OFF.')
         return False
-    # start X connection
-    client = Client()
+    # skip connection when cached trading hours say every market is closed
+    hours = TradingHours(backend=Cache())
+    if hours.known(x.symbols) and not any(hours.status(x.symbols).values()):
+        logger.debug('Markets are closed.')
+        return False
+    # start X connection (or reuse pooled session), rate limited per account across processes
+    pooled = pool is not None
+    pool = pool if pooled else SessionPool(factory=new_client)
     try:
-        client.login(x.account.name, x.account.secret, mode=x.account.mode)
+        client = pool.get(x.account.name, x.account.secret, mode=x.account.mode)
     except CommandFailed:
         logger.debug('Gate is closed.')
         return False
     logger.debug('Enter the Gate.')
+    client.symbols.get(x.symbols[0], client)  # bulk prefetch when stale
+    # live candles and prices of the symbols, for the next cycles and the order path
+    if store is not None and streams is not None:
+        stream = open_stream(client, store, streams, x.account.mode)
+        timeframe = x.source_timeframe or x.timeframe
+        for symbol in x.symbols:
+            if timeframe <= STREAM_TIMEFRAME:
+                stream.subscribe_candles(symbol, timeframe, client.symbols.digits(symbol, 5))
+            stream.subscribe_tick_prices(symbol)
 
     # Check if market is open
     market_status = client.get_market_status(x.symbols)
@@ -108,15 +228,19 @@ def run(app):
     tx = Trade(client=client, param=app.param)
     for symbol, status in market_status.items():
         # Validate market status, signal and data timestamp
-        r = Result(symbol, app, client=client)
+        r = Result(symbol, app, client=client, store=store)
         r.market_status = status
         r.get_candles()
+        r.gen_signals(x.ind_preset)
         for preset in x.ind_preset:
             r.gen_signal(preset)
             data_ts = report.setts(datetime.fromtimestamp(int(r.epoch_ms)/1000))
             delta_ts = system_ts - data_ts
             if (not status) or (not r.action) or (delta_ts.seconds // 60 > x.timeframe + 5):
                 continue
+            # the first 5 minutes of a bar all see its signal, act on it once
+            if not first_signal(app, symbol, preset, r.epoch_ms):
+                continue
             report_time = data_ts.strftime("%Y-%m-%d %H:%M:%S")
             logger.info(f'Signal: {symbol}, {r.action}, {r.mode.upper()}, {r.price} at {report_time}')
             debug_col_idx = [0, 1, 3, -7, -6, -5, -4, -3, -2, -1]
@@ -148,7 +272,8 @@ def run(app):
 
     # store tx records in cache
     tx.store_records(x.account.name)
-    client.logout()
+    if not pooled:
+        pool.close()
     # stop conn, send chat notification
     gcp = Cloud()
     if report.texts:
@@ -157,17 +282,32 @@ def run(app):
     return True
 
 
-def demo() -> None:
+def demo(forever: bool = False) -> None:
+    # one logged-in session per account, shared by its Apps
+    pool = SessionPool(factory=new_client)
+    # streamed candles per account mode, read by the cycles after the first one
+    stores = {}
+    streams = {}
     # loop through each App in profile settings
-    for app in settings.profiles:
-        # get and check App's account credential
-        account: dict = accounts.get(app.param.account.name, {})
-        if account:
-            app.param.account.secret = account.get('pass', '')
-            app.param.account.mode = account.get('mode', 'demo')
-            if run(app):
-                time.sleep(10)
+    try:
+        while True:
+            for app in settings.profiles:
+                # get and check App's account credential
+                account: dict = accounts.get(app.param.account.name, {})
+                if account:
+                    app.param.account.secret = account.get('pass', '')
+                    app.param.account.mode = account.get('mode', 'demo')
+                    store = stores.setdefault(app.param.account.mode, CandleStore(maxlen=CANDLE_WINDOW))
+                    run(app, pool=pool, store=store, streams=streams)
+            if not forever:
+                break
+            # next cycle when the next minute starts
+            time.sleep(60 - datetime.now().second)
+    finally:
+        for stream in streams.values():
+            stream.close()
+        pool.close()
 
 
 if __name__ == '__main__':
-    demo()
+    demo(forever=os.getenv('APP_FOREVER', '') == '1')
@@ -0,0 +1,27 @@
+from initial import settings, accounts
+from classes import Mongo
+from classes.archive import archive
+from redis.exceptions import ConnectionError
+import logging
+logger = logging.getLogger('xtb.archiver')
+
+
+def run() -> None:
+    series = set()
+    for app in settings.profiles:
+        x = app.param
+        mode = accounts.get(x.account.name, {}).get('mode', 'demo')
+        series.update((mode, symbol, x.timeframe) for symbol in x.symbols)
+    db = Mongo(db='xtb')
+    try:
+        for mode, symbol, timeframe in sorted(series):
+            try:
+                archive(db, mode, symbol, timeframe)
+            except ConnectionError as e:
+                logger.error(e)
+    finally:
+        db.client.close()
+
+
+if __name__ == '__main__':
+    run()
@@ -1,10 +1,14 @@
 from bt_initial import settings, symbol_digits, ind_presets
 from bt_trades import Orders
-from classes import Mongo, Profile, Fx, FXTYPE
+from classes import Mongo, Cache, ColumnarStore, Profile, Fx, FXTYPE
+from XTBApi.symbols import SymbolCache
+from classes.candles import from_columns
 from pandas import DataFrame
 import pandas_ta as ta
 import logging
 logger = logging.getLogger('xtb.backtest')
+# symbol metadata cached in Redis by the live app, hard-coded table as fallback
+symbols = SymbolCache(backend=Cache())
 add_tech = [
     # {"kind": "bbands", "length": 20},
     {"kind": "macd", "signal_indicators": True},
@@ -18,23 +22,24 @@ class Result:
         self.app = app
         self.df = DataFrame()
         self.candles = DataFrame()
-        digits = symbol_digits.get(symbol, 2)
+        digits = symbols.digits(symbol, default=symbol_digits.get(symbol, 2))
         self.digits = digits
         self.orders = Orders(symbol, digits, volume=app.param.volume)
 
     def get_candles(self):
         x = self.app.param
-        rate_infos = []
-        # Start DB connection
+        store = ColumnarStore('real', self.symbol, x.timeframe)
+        # top up local history with the candles DB got since last run
         db = Mongo(db='xtb')
         key_group = f'real_{self.symbol}_{x.timeframe}'
-        rate_infos.extend(db.find_all(key_group))
+        newer = db.find_range(key_group, start_ctm=store.last_ctm() + 1)
         db.client.close()
+        store.append(from_columns(newer))
+        rate_infos = store.range()
         # prepare candles
-        logger.debug(f'GetCD: {len(rate_infos)} ticks')
-        if not rate_infos:
+        logger.debug(f'GetCD: {len(rate_infos["ctm"])} ticks')
+        if not len(rate_infos['ctm']):
             return DataFrame()
-        rate_infos.sort(key=lambda by: by['ctm'])
         candles = DataFrame(rate_infos)
         candles['close'] = (candles['open'] + candles['close']) / 10 ** self.digits
         candles['high'] = (candles['open'] + candles['high']) / 10 ** self.digits
@@ -2,11 +2,21 @@
 # __all__ = [cache, cloud, kv, notify, trade]
 
 from classes.notify import Notify
-from classes.cache import Cache
-from classes.cloud import Cloud
+from classes.cache import Cache, AsyncCache, CandleSeries
 from classes.kv import KV
 from classes.fx import Fx, FXTYPE, FXMODE
+from classes.indicators import IndicatorEngine, MultiPresetEngine, IndicatorState
 from classes.trade import Trade
 from classes.profile import Settings, Account, Profile
 from classes.mongo import Mongo
-__all__ = [Notify, Cache, Cloud, KV, Fx, Trade, Settings, Account, Profile, Mongo]
+from classes.columnar import ColumnarStore
+from classes.ratelimit import RedisTokenBucket
+__all__ = [Notify, Cache, AsyncCache, CandleSeries, 'Cloud', KV, Fx, IndicatorEngine, MultiPresetEngine, IndicatorState, Trade, Settings, Account, Profile, Mongo, ColumnarStore, RedisTokenBucket]
+
+
+def __getattr__(name):
+    # google-cloud is imported on first use of Cloud only
+    if name == 'Cloud':
+        from classes.cloud import Cloud
+        return Cloud
+    raise AttributeError(f"module 'classes' has no attribute {name!r}")
@@ -0,0 +1,38 @@
+from datetime import datetime
+from classes.cache import Cache, CandleSeries
+from classes.candles import to_rate_infos
+from classes.mongo import Mongo
+import logging
+logger = logging.getLogger('xtb.archiver')
+
+
+def get_watermark(db: Mongo, key_group: str) -> int:
+    """ctm of the newest candle archived for series, 0 if none."""
+    doc = db.db['watermarks'].find_one({'series': key_group})
+    return doc['ctm'] if doc else 0
+
+
+def archive(db: Mongo, mode: str, symbol: str, timeframe: int, cache: Cache = None) -> int:
+    """Ship closed candles of one series newer than its watermark from Redis to Mongo.
+    The watermark stops before the first candle that failed for another reason than a duplicate."""
+    key_group = f'{mode}_{symbol}_{timeframe}'
+    now_ms = int(datetime.now().timestamp()) * 1000
+    watermark = get_watermark(db, key_group)
+    candles = CandleSeries(mode, symbol, timeframe, cache=cache).read(start_ctm=watermark + 1)
+    candles = candles[candles['ctm'] + timeframe*60_000 <= now_ms]
+    if not len(candles):
+        return 0
+    db.ensure_ctm_index(key_group)
+    # unique ctm index turns a replay after a crash into duplicate-key no-ops
+    n_inserted, failed = db.insert_new(key_group, to_rate_infos(candles))
+    if failed:
+        first = min(e['index'] for e in failed)
+        logger.error(f'{key_group}: {len(failed)} candles not archived from {candles["ctm"][first]}, '
+                     f'{failed[0].get("errmsg")}')
+        candles = candles[:first]
+        if not len(candles):
+            return n_inserted
+    db.upsert_one('watermarks', {'series': key_group},
+                  {'series': key_group, 'ctm': int(candles['ctm'][-1])})
+    logger.info(f'{key_group}: archived {n_inserted} up to {candles["ctm"][-1]}')
+    return n_inserted
@@ -1,24 +1,222 @@
 import os
 import json
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, asynccontextmanager
 from redis.client import Redis
+from redis.connection import ConnectionPool
+import numpy as np
+from classes import candles as codec
+from classes import resample
+
+_pools: dict = {}
+_pools_lock = threading.Lock()
+
+
+def connection_pool(decode_responses: bool = True, asyncio: bool = False):
+    """Process-wide Redis connection pool, one per (decode_responses, asyncio)."""
+    with _pools_lock:
+        if (decode_responses, asyncio) not in _pools:
+            if asyncio:
+                from redis.asyncio import ConnectionPool as AsyncConnectionPool
+                pool_class = AsyncConnectionPool
+            else:
+                pool_class = ConnectionPool
+            _pools[(decode_responses, asyncio)] = pool_class(
+                host=os.getenv("REDIS_HOST"),
+                port=os.getenv("REDIS_PORT"),
+                decode_responses=decode_responses,
+            )
+        return _pools[(decode_responses, asyncio)]
 
 
 class Cache:
-    """Extended class of Redis cache. Accept dict and store as string."""
-    def __init__(self) -> None:
-        self.ttl_s: int = 604_800
-        self.client: Redis = Redis(
-            host=os.getenv("REDIS_HOST"),
-            port=os.getenv("REDIS_PORT"),
-            decode_responses=True,
-        )
+    """Extended class of Redis cache. Accept dict and store as string.
+    All instances of a process share one connection pool."""
+    def __init__(self, ttl_s: int = 604_800, decode_responses: bool = True) -> None:
+        self.ttl_s: int = ttl_s
+        self.client: Redis = Redis(connection_pool=connection_pool(decode_responses))
 
     def set_key(self, key: str, value: dict, **kwargs):
-        self.ttl_s = kwargs.pop('ttl_s', self.ttl_s)
-        self.client.set(key, json.dumps(value), ex=self.ttl_s)
+        self.client.set(key, json.dumps(value), ex=kwargs.pop('ttl_s', self.ttl_s))
 
     def get_key(self, key: str) -> dict:
         return json.loads(self.client.get(key))
 
     def get_keys(self, keys: list[str]) -> list[dict]:
         return [json.loads(s) for s in self.client.mget(keys)]
+
+    def set_many(self, values: dict[str, dict], **kwargs):
+        """Set every key of values in one round trip."""
+        ttl_s = kwargs.pop('ttl_s', self.ttl_s)
+        with self.pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(key, json.dumps(value), ex=ttl_s)
+
+    def get_many(self, keys: list[str]) -> dict[str, dict]:
+        """{key: value} in one round trip, None for missing keys."""
+        return {k: (json.loads(s) if s is not None else None)
+                for k, s in zip(keys, self.client.mget(keys))}
+
+    @contextmanager
+    def pipeline(self, transaction: bool = False):
+        """Queue commands on the yielded pipeline, executed together on exit."""
+        pipe = self.client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+            pipe.execute()
+        finally:
+            pipe.reset()
+
+
+class AsyncCache:
+    """Cache for asyncio code, same API with coroutines, on redis.asyncio."""
+    def __init__(self, ttl_s: int = 604_800) -> None:
+        from redis.asyncio import Redis as AsyncRedis
+        self.ttl_s: int = ttl_s
+        self.client = AsyncRedis(connection_pool=connection_pool(asyncio=True))
+
+    async def set_key(self, key: str, value: dict, **kwargs):
+        await self.client.set(key, json.dumps(value), ex=kwargs.pop('ttl_s', self.ttl_s))
+
+    async def get_key(self, key: str) -> dict:
+        return json.loads(await self.client.get(key))
+
+    async def set_many(self, values: dict[str, dict], **kwargs):
+        ttl_s = kwargs.pop('ttl_s', self.ttl_s)
+        async with self.pipeline() as pipe:
+            for key, value in values.items():
+                pipe.set(key, json.dumps(value), ex=ttl_s)
+
+    async def get_many(self, keys: list[str]) -> dict[str, dict]:
+        return {k: (json.loads(s) if s is not None else None)
+                for k, s in zip(keys, await self.client.mget(keys))}
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False):
+        pipe = self.client.pipeline(transaction=transaction)
+        try:
+            yield pipe
+            await pipe.execute()
+        finally:
+            await pipe.reset()
+
+
+class CandleLRU:
+    """In-process tier of normalised candle windows keyed by (series key, last ctm, ...).
+    Least recently used windows are evicted once their arrays exceed max_bytes."""
+    def __init__(self, max_bytes: int = 64 * 2**20) -> None:
+        self.max_bytes: int = max_bytes
+        self.nbytes: int = 0
+        self._windows: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key not in self._windows:
+                return None
+            self._windows.move_to_end(key)
+            return self._windows[key]
+
+    def put(self, key: tuple, columns: dict[str, np.ndarray]):
+        with self._lock:
+            if key in self._windows:
+                return
+            self._windows[key] = columns
+            self.nbytes += sum(c.nbytes for c in columns.values())
+            while self.nbytes > self.max_bytes and len(self._windows) > 1:
+                _, evicted = self._windows.popitem(last=False)
+                self.nbytes -= sum(c.nbytes for c in evicted.values())
+
+    def invalidate(self, series_key: str, since_ctm: int = 0):
+        """Drop windows of series that hold any candle at or after since_ctm."""
+        with self._lock:
+            for key in [k for k in self._windows if k[0] == series_key and k[1] >= since_ctm]:
+                self.nbytes -= sum(c.nbytes for c in self._windows.pop(key).values())
+
+
+# shared by every CandleSeries of the process
+candle_lru = CandleLRU()
+
+
+class CandleSeries:
+    """Candles of one (mode, symbol, timeframe) series, kept as a Redis sorted set of
+    packed chunks (classes.candles codec) scored by the first ctm of the chunk.
+    Writes are WATCH/MULTI transactions, reads are ZRANGEBYSCORE and one np.frombuffer."""
+    def __init__(self, mode: str, symbol: str, timeframe: int, cache: Cache = None, **kwargs) -> None:
+        self.key: str = f'candles:v{codec.CODEC_VERSION}:{mode}_{symbol}_{timeframe}'
+        self.cache: Cache = cache or Cache(decode_responses=False)
+        self.ttl_s: int = kwargs.pop('ttl_s', timeframe*172_800)
+        self.chunk_ms: int = timeframe * 60_000 * kwargs.pop('chunk', 256)
+        self.timeframe_ms: int = timeframe * 60_000
+        self.lru: CandleLRU = kwargs.pop('lru', candle_lru)
+
+    def _chunks(self, start_ctm, end_ctm, client=None) -> np.ndarray:
+        if start_ctm != '-inf':
+            start_ctm = int(start_ctm) - int(start_ctm) % self.chunk_ms
+        if end_ctm != '+inf':
+            end_ctm = int(end_ctm)
+        client = client if client is not None else self.cache.client
+        return codec.decode(b''.join(client.zrangebyscore(self.key, start_ctm, end_ctm)))
+
+    def write(self, rate_infos) -> int:
+        """Upsert candles (rateInfos dicts or codec array) by ctm, drop chunks older than ttl_s.
+        Chunks are read and rewritten under WATCH, retried when another writer got in between."""
+        new = codec.to_array(rate_infos) if not isinstance(rate_infos, np.ndarray) else rate_infos
+        if not len(new):
+            return 0
+
+        def upsert(pipe):
+            merged = codec.merge(self._chunks(new['ctm'].min(), new['ctm'].max(), client=pipe), new)
+            starts = merged['ctm'] - merged['ctm'] % self.chunk_ms
+            # a series also resampled into a coarser timeframe is kept as long as its longest reader
+            ttl_s = max(self.ttl_s, pipe.ttl(self.key))
+            pipe.multi()
+            for start in np.unique(starts):
+                pipe.zremrangebyscore(self.key, int(start), int(start))
+                pipe.zadd(self.key, {codec.encode(merged[starts == start]): int(start)})
+            expired_ms = (int(time.time()) - ttl_s) * 1000
+            pipe.zremrangebyscore(self.key, '-inf', f'({expired_ms - self.chunk_ms}')
+            pipe.expire(self.key, ttl_s)
+        self.cache.client.transaction(upsert, self.key)
+        self.lru.invalidate(self.key, since_ctm=int(new['ctm'].min()))
+        return len(new)
+
+    def read(self, start_ctm='-inf', end_ctm='+inf') -> np.ndarray:
+        """Candles with start_ctm <= ctm <= end_ctm as a codec array, oldest first."""
+        arr = self._chunks(start_ctm, end_ctm)
+        lo = -np.inf if start_ctm == '-inf' else int(start_ctm)
+        hi = np.inf if end_ctm == '+inf' else int(end_ctm)
+        return arr[(arr['ctm'] >= lo) & (arr['ctm'] <= hi)]
+
+    def first_ctm(self) -> int:
+        """ctm of the oldest candle, 0 if the series is empty."""
+        first = self.cache.client.zrange(self.key, 0, 0)
+        return int(codec.decode(first[0])['ctm'][0]) if first else 0
+
+    def last_ctm(self) -> int:
+        """ctm of the newest candle, 0 if the series is empty."""
+        last = self.cache.client.zrevrange(self.key, 0, 0)
+        return int(codec.decode(last[0])['ctm'][-1]) if last else 0
+
+    def window(self, last_ctm: int, length: int, digits: int, timeframe: int = None) -> dict[str, np.ndarray]:
+        """Normalised columns of the candles in the length periods up to last_ctm.
+        With a coarser timeframe (min), complete bars resampled from this series instead.
+        Served from the in-process tier when this window was read before; shared, read-only."""
+        timeframe = timeframe or self.timeframe_ms // 60_000
+        key = (self.key, last_ctm, length, digits, timeframe)
+        columns = self.lru.get(key)
+        if columns is None:
+            if timeframe * 60_000 == self.timeframe_ms:
+                arr = self.read(last_ctm - (length-1)*self.timeframe_ms, last_ctm)
+            else:
+                first = resample.bucket_starts([last_ctm - length*timeframe*60_000], timeframe)[0]
+                arr = resample.resample(self.read(first, last_ctm), timeframe)
+                # the last bar is in progress while the next candle would still fall into it
+                if len(arr) and resample.bucket_starts([last_ctm + self.timeframe_ms], timeframe)[0] == arr['ctm'][-1]:
+                    arr = arr[:-1]
+                arr = arr[-length:]
+            columns = codec.normalise(arr, digits)
+            self.lru.put(key, columns)
+        return columns
@@ -0,0 +1,69 @@
+import numpy as np
+
+# Packed candle record, 32 bytes. Prices are kept as XTB sends them: open
+# shifted by digits, close/high/low as offsets from open. ctmString is dropped.
+CODEC_VERSION = 1
+CANDLE_DTYPES = {
+    1: np.dtype([('ctm', '<i8'), ('open', '<i8'), ('close', '<i4'), ('high', '<i4'), ('low', '<i4'),
+                 ('vol', '<f4')]),
+}
+CANDLE_DTYPE = CANDLE_DTYPES[CODEC_VERSION]
+_PRICE_FIELDS = ('ctm', 'open', 'close', 'high', 'low')
+
+
+def to_array(rate_infos: list[dict]) -> np.ndarray:
+    """Structured array of rateInfos dicts, in their order."""
+    arr = np.empty(len(rate_infos), dtype=CANDLE_DTYPE)
+    for field in _PRICE_FIELDS:
+        arr[field] = np.rint([c[field] for c in rate_infos])
+    arr['vol'] = [c['vol'] for c in rate_infos]
+    return arr
+
+
+def from_columns(cols: dict[str, np.ndarray]) -> np.ndarray:
+    """Structured array of per-field columns, e.g. Mongo.find_range output."""
+    arr = np.empty(len(cols['ctm']), dtype=CANDLE_DTYPE)
+    for field in CANDLE_DTYPE.names:
+        arr[field] = cols[field]
+    return arr
+
+
+def to_rate_infos(arr: np.ndarray) -> list[dict]:
+    """rateInfos dicts of a structured array, without ctmString."""
+    return [{'ctm': int(c['ctm']), 'open': float(c['open']), 'close': float(c['close']),
+             'high': float(c['high']), 'low': float(c['low']), 'vol': float(c['vol'])} for c in arr]
+
+
+def normalise(arr: np.ndarray, digits: int) -> dict[str, np.ndarray]:
+    """Read-only columns with prices as floats (open + offset) / 10**digits."""
+    scale = 10.0 ** digits
+    columns = {
+        'ctm': arr['ctm'].copy(),
+        'open': arr['open'] / scale,
+        'close': (arr['open'] + arr['close']) / scale,
+        'high': (arr['open'] + arr['high']) / scale,
+        'low': (arr['open'] + arr['low']) / scale,
+        'vol': arr['vol'].astype(np.float64),
+    }
+    for column in columns.values():
+        column.setflags(write=False)
+    return columns
+
+
+def merge(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """Union sorted by ctm, candles of new replace the ones of old with same ctm."""
+    both = np.concatenate([old, new])[::-1]
+    _, first = np.unique(both['ctm'], return_index=True)
+    return both[first]
+
+
+def encode(candles) -> bytes:
+    """Packed bytes of a structured array or of rateInfos dicts."""
+    if not isinstance(candles, np.ndarray):
+        candles = to_array(candles)
+    return candles.astype(CANDLE_DTYPE, copy=False).tobytes()
+
+
+def decode(buf: bytes, version: int = CODEC_VERSION) -> np.ndarray:
+    """Read-only structured array over buf, no copy."""
+    return np.frombuffer(buf, dtype=CANDLE_DTYPES[version])
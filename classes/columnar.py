@@ -0,0 +1,135 @@
+import os
+import json
+import fcntl
+import numpy as np
+from contextlib import contextmanager
+from classes.candles import CANDLE_DTYPE, CODEC_VERSION, to_array, merge
+import logging
+LOGGER = logging.getLogger(__name__)
+
+
+class ColumnarStore:
+    """Local append-only candle history of one (mode, symbol, timeframe), one file per column.
+    Columns load memory-mapped, so readers share pages and slice by ctm without copies.
+    The committed length lives in meta.json, replaced atomically after the columns are
+    synced: readers never see a torn append. Holes filled before the last candle rewrite
+    the columns into a new generation of files, committed by meta.json the same way."""
+    def __init__(self, mode: str, symbol: str, timeframe: int, root: str = None) -> None:
+        root = root or os.getenv("CANDLE_DIR", default="data/candles")
+        self.path: str = os.path.join(root, f'v{CODEC_VERSION}', f'{mode}_{symbol}_{timeframe}')
+        self.timeframe: int = timeframe
+
+    def _column(self, field: str, generation: int = 0) -> str:
+        name = f'{field}.{generation}.bin' if generation else f'{field}.bin'
+        return os.path.join(self.path, name)
+
+    def _meta(self) -> dict:
+        try:
+            with open(os.path.join(self.path, 'meta.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'length': 0, 'last_ctm': 0}
+
+    @contextmanager
+    def _locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, '.lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return self._meta()['length']
+
+    def last_ctm(self) -> int:
+        return self._meta()['last_ctm']
+
+    def _commit(self, meta: dict):
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+    def _append(self, meta: dict, new: np.ndarray) -> int:
+        generation = meta.get('generation', 0)
+        new = np.sort(new[new['ctm'] > meta['last_ctm']], order='ctm')
+        new = new[np.unique(new['ctm'], return_index=True)[1]]
+        if not len(new):
+            return 0
+        for field in CANDLE_DTYPE.names:
+            itemsize = CANDLE_DTYPE[field].itemsize
+            with open(self._column(field, generation), 'ab') as f:
+                # drop the tail of an append that never got committed
+                f.truncate(meta['length'] * itemsize)
+                f.write(np.ascontiguousarray(new[field]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+        meta = {'length': meta['length'] + len(new), 'last_ctm': int(new['ctm'][-1]), 'generation': generation}
+        self._commit(meta)
+        LOGGER.debug(f'{self.path}: appended {len(new)}, length {meta["length"]}')
+        return len(new)
+
+    def append(self, rate_infos) -> int:
+        """Append closed candles (rateInfos dicts or codec array) newer than the last stored one."""
+        new = to_array(rate_infos) if not isinstance(rate_infos, np.ndarray) else rate_infos
+        with self._locked():
+            return self._append(self._meta(), new)
+
+    def merge(self, rate_infos) -> int:
+        """Add closed candles missing from the history, in holes before the last stored one too.
+        Stored candles are kept. Filled holes rewrite every column into the next generation;
+        the previous one stays for readers that mapped it."""
+        new = to_array(rate_infos) if not isinstance(rate_infos, np.ndarray) else rate_infos
+        with self._locked():
+            meta = self._meta()
+            stored = self._read(meta)
+            holes = new[(new['ctm'] <= meta['last_ctm']) & ~np.isin(new['ctm'], stored['ctm'])]
+            if not len(holes):
+                return self._append(meta, new)
+            merged = merge(merge(holes, stored), new[new['ctm'] > meta['last_ctm']])
+            generation = meta.get('generation', 0) + 1
+            for field in CANDLE_DTYPE.names:
+                with open(self._column(field, generation), 'wb') as f:
+                    f.write(np.ascontiguousarray(merged[field]).tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._commit({'length': len(merged), 'last_ctm': int(merged['ctm'][-1]), 'generation': generation})
+            for field in CANDLE_DTYPE.names if generation >= 2 else ():
+                try:
+                    os.remove(self._column(field, generation - 2))
+                except FileNotFoundError:
+                    pass
+        n = len(merged) - meta['length']
+        LOGGER.debug(f'{self.path}: merged {n}, {len(holes)} in holes, length {len(merged)}')
+        return n
+
+    def _read(self, meta: dict) -> np.ndarray:
+        """Copy of the committed candles as a codec array."""
+        arr = np.empty(meta['length'], dtype=CANDLE_DTYPE)
+        for field, col in self._columns(meta).items():
+            arr[field] = col
+        return arr
+
+    def _columns(self, meta: dict) -> dict[str, np.ndarray]:
+        length = meta['length']
+        if not length:
+            return {field: np.empty(0, dtype=CANDLE_DTYPE[field]) for field in CANDLE_DTYPE.names}
+        generation = meta.get('generation', 0)
+        return {field: np.memmap(self._column(field, generation), dtype=CANDLE_DTYPE[field], mode='r',
+                                 shape=(length,))
+                for field in CANDLE_DTYPE.names}
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """Read-only memory-mapped columns of every committed candle."""
+        return self._columns(self._meta())
+
+    def range(self, start_ctm: int = None, end_ctm: int = None) -> dict[str, np.ndarray]:
+        """Columns sliced to start_ctm <= ctm <= end_ctm, as views of the maps."""
+        cols = self.columns()
+        lo = 0 if start_ctm is None else np.searchsorted(cols['ctm'], start_ctm, side='left')
+        hi = len(cols['ctm']) if end_ctm is None else np.searchsorted(cols['ctm'], end_ctm, side='right')
+        return {field: col[lo:hi] for field, col in cols.items()}
@@ -0,0 +1,93 @@
+import numpy as np
+from XTBApi.hours import TradingHours, DAY, WEEK
+from classes.cache import Cache
+import logging
+LOGGER = logging.getLogger(__name__)
+
+
+def runs(ctms: np.ndarray, period_ms: int) -> list[list[int]]:
+    """Contiguous [first, last] ctm runs of sorted ctms."""
+    if not len(ctms):
+        return []
+    breaks = np.flatnonzero(np.diff(ctms) > period_ms)
+    starts = np.r_[ctms[0], ctms[breaks + 1]]
+    ends = np.r_[ctms[breaks], ctms[-1]]
+    return [[int(a), int(b)] for a, b in zip(starts, ends)]
+
+
+def open_mask(hours: TradingHours, symbol: str, ctms: np.ndarray, period_ms: int) -> np.ndarray:
+    """True for candles whose start, middle or end falls in a trading session of symbol."""
+    week = np.array(hours.week(symbol)).reshape(-1, 2)
+    mask = np.zeros(len(ctms), dtype=bool)
+    if not len(week):
+        return ~mask
+    for offset in (0, period_ms // 2, period_ms - 1):
+        # epoch 0 was a Thursday, 3 days after a Monday
+        sec = ((ctms + offset) // 1000 + 3 * DAY) % WEEK
+        i = np.searchsorted(week[:, 0], sec, side='right') - 1
+        mask |= (i >= 0) & (sec <= week[np.maximum(i, 0), 1])
+    return mask
+
+
+class Coverage:
+    """Index of the ctm intervals of one (mode, symbol, timeframe) series known to be complete,
+    either held in cache or checked with the broker. Kept in Redis next to the series."""
+    def __init__(self, mode: str, symbol: str, timeframe: int, cache: Cache = None) -> None:
+        self.key: str = f'coverage:{mode}_{symbol}_{timeframe}'
+        self.symbol: str = symbol
+        self.period_ms: int = timeframe * 60_000
+        self.cache: Cache = cache or Cache()
+        self.intervals: list[list[int]] = []
+
+    def load(self) -> bool:
+        """Read the stored index, False if there is none."""
+        try:
+            self.intervals = self.cache.get_key(self.key)
+        except TypeError:
+            return False
+        return True
+
+    def save(self, ttl_s: int):
+        self.cache.set_key(self.key, self.intervals, ttl_s=ttl_s)
+
+    def add(self, start_ctm: int, end_ctm: int):
+        """Mark candles start_ctm..end_ctm as complete."""
+        if end_ctm < start_ctm:
+            return
+        merged = []
+        for a, b in sorted(self.intervals + [[int(start_ctm), int(end_ctm)]]):
+            if merged and a <= merged[-1][1] + self.period_ms:
+                merged[-1][1] = max(merged[-1][1], b)
+            else:
+                merged.append([a, b])
+        self.intervals = merged
+
+    def add_ctms(self, ctms: np.ndarray):
+        for a, b in runs(np.sort(ctms), self.period_ms):
+            self.add(a, b)
+
+    def gaps(self, start_ctm: int, end_ctm: int, hours: TradingHours = None) -> list[tuple[int, int]]:
+        """[first, last] ctm of missing candles between start_ctm and end_ctm.
+        With hours, holes are trimmed to candles where the market was open, and dropped if none."""
+        holes = []
+        cursor = start_ctm - start_ctm % self.period_ms
+        for a, b in self.intervals:
+            if b < cursor:
+                continue
+            if a > end_ctm:
+                break
+            if a > cursor:
+                holes.append((cursor, a - self.period_ms))
+            cursor = b + self.period_ms
+        if cursor <= end_ctm:
+            holes.append((cursor, end_ctm - (end_ctm - cursor) % self.period_ms))
+        if hours is None:
+            return holes
+        trimmed = []
+        for a, b in holes:
+            ctms = np.arange(a, b + 1, self.period_ms, dtype=np.int64)
+            opened = ctms[open_mask(hours, self.symbol, ctms, self.period_ms)]
+            if len(opened):
+                trimmed.append((int(opened[0]), int(opened[-1])))
+        LOGGER.debug(f'{self.key}: {len(trimmed)} gaps of {len(holes)} holes while open')
+        return trimmed
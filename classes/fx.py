@@ -1,7 +1,12 @@
+import numpy as np
 from pandas import DataFrame, concat
-from pandas_ta.utils import signals as ta_signals
 from enum import Enum
-import pandas_ta as ta
+# only Fx.evaluate needs pandas_ta, the enums and signal kernels do not
+try:
+    import pandas_ta as ta
+    from pandas_ta.utils import signals as ta_signals
+except ImportError:
+    ta = ta_signals = None
 
 
 class FXTYPE(Enum):
@@ -16,6 +21,55 @@ class FXMODE(Enum):
     NA = 0
 
 
+def _fx(conditions: list, choices: list) -> tuple[np.ndarray, np.ndarray]:
+    """fx_type, fx_mode arrays of the first true condition per row, STAY/NA if none."""
+    fx_type = np.select(conditions, [np.int64(t.value) for t, _ in choices], default=FXTYPE.STAY.value)
+    fx_mode = np.select(conditions, [np.int64(m.value) for _, m in choices], default=FXMODE.NA.value)
+    return fx_type, fx_mode
+
+
+def emax_x(f0, s0, f, s) -> tuple[np.ndarray, np.ndarray]:
+    """Fast EMA crossing slow EMA between previous and current row."""
+    return _fx([(f0 > s0) & (f < s), (f0 < s0) & (f > s)],
+               [(FXTYPE.OPEN, FXMODE.SELL), (FXTYPE.OPEN, FXMODE.BUY)])
+
+
+def macd_x(xa, xb) -> tuple[np.ndarray, np.ndarray]:
+    """MACD histogram crossing above/below zero."""
+    return _fx([xa != 0, xb != 0],
+               [(FXTYPE.OPEN, FXMODE.BUY), (FXTYPE.OPEN, FXMODE.SELL)])
+
+
+def rsi_x(a0, b0, a, b) -> tuple[np.ndarray, np.ndarray]:
+    """RSI above/below signal bits of previous and current row: a jump across both levels closes,
+    otherwise acting only when exactly one bit is set."""
+    bits = np.column_stack([a0, b0, a, b]).astype(np.int64)
+    code = np.where(np.isin(bits, [0, 1]).all(axis=1), bits @ np.array([1000, 100, 10, 1]), -1)
+    one = bits.sum(axis=1) == 1
+    opened = one & ((bits[:, 0] != 0) | (bits[:, 1] != 0))
+    buy = (bits[:, 1] != 0) | (bits[:, 2] != 0)
+    return _fx([code == 110, code == 1001, opened & buy, opened, one & buy, one],
+               [(FXTYPE.CLOSE, FXMODE.BUY), (FXTYPE.CLOSE, FXMODE.SELL),
+                (FXTYPE.OPEN, FXMODE.BUY), (FXTYPE.OPEN, FXMODE.SELL),
+                (FXTYPE.CLOSE, FXMODE.BUY), (FXTYPE.CLOSE, FXMODE.SELL)])
+
+
+def stoch_x(k0, d0, k, d, a0, b0, a, b) -> tuple[np.ndarray, np.ndarray]:
+    """Stochastic scenario of above/below bits (previous and current row) and %K/%D crossing."""
+    bits = np.column_stack([a0, b0, a, b]).astype(np.int64)
+    valid = np.isin(bits, [0, 1]).all(axis=1)
+    code = bits @ np.array([1000, 100, 10, 1])
+
+    def scene(*patterns):
+        return valid & np.isin(code, [int(p) for p in patterns])
+
+    kd_cross = (k0 - d0) * (k - d) < 0
+    return _fx([scene('0001', '1000', '1001'), scene('0010', '0100', '0110'),
+                scene('0101') & kd_cross, scene('1010') & kd_cross],
+               [(FXTYPE.CLOSE, FXMODE.BUY), (FXTYPE.CLOSE, FXMODE.SELL),
+                (FXTYPE.OPEN, FXMODE.BUY), (FXTYPE.OPEN, FXMODE.SELL)])
+
+
 def _add_signal(df: DataFrame, ind_name: str, **kwargs) -> DataFrame:
     ind = df[ind_name]
     signalsdf = concat(
@@ -58,14 +112,6 @@ class Fx:
         """As evaluate function, takes DataFrame candles contains 'EMA...' column,
         return: (str)what_to_action, (str)mode_buy_or_sell.
         """
-        def ema_x(row):
-            f1, s1, f2, s2 = row.values.tolist()
-            if f1 > s1 and f2 < s2:
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
-            if f1 < s1 and f2 > s2:
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
-            return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
-
         self.name = 'emax'
         cols = self.df.columns.to_list()
         cols_ema = [c for c in cols if c.startswith('EMA')]
@@ -80,22 +126,12 @@ class Fx:
         self.df[cb0] = self.df[cb].shift()
         self.df.dropna(inplace=True, ignore_index=True)
         # apply
-        self.df[['fx_type', 'fx_mode']] = DataFrame(
-            self.df[[ca0, cb0, ca, cb]].apply(ema_x, axis=1).values.tolist()
-        )
+        self.df['fx_type'], self.df['fx_mode'] = emax_x(*(self.df[c].to_numpy() for c in (ca0, cb0, ca, cb)))
 
     def _evaluate_macd(self):
         """As evaluate function, takes DataFrame candles contains 'MACD..._XA_0' column,
         return: (str)what_to_action, (str)mode_buy_or_sell.
         """
-        def macd_x(row):
-            xa, xb = row.values.tolist()
-            if xa:
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
-            if xb:
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
-            return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
-
         self.name = 'macd'
         cols = self.df.columns.to_list()
         col_xa = {'name': c for c in cols if c.startswith('MACD') and ('_XA_' in c)}
@@ -106,26 +142,12 @@ class Fx:
         cb = col_xb['name']
         # apply
         self.df.dropna(inplace=True, ignore_index=True)
-        self.df[['fx_type', 'fx_mode']] = DataFrame(
-            self.df[[ca, cb]].apply(macd_x, axis=1).values.tolist()
-        )
+        self.df['fx_type'], self.df['fx_mode'] = macd_x(*(self.df[c].to_numpy() for c in (ca, cb)))
 
     def _evaluate_rsi(self):
         """As evaluate function, takes DataFrame candles contains 'RSI..._A_' or 'RSI..._B_' column,
         return: (str)what_to_action, (str)mode_buy_or_sell.
         """
-        def rsi_x(row):
-            bits = row.values.tolist()
-            if sum(bits) != 1:
-                if "".join((str(i) for i in bits)) == '0110':
-                    return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.BUY.value}
-                if "".join((str(i) for i in bits)) == '1001':
-                    return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.SELL.value}
-                return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
-            fx_type = FXTYPE.OPEN.value if bits[0] or bits[1] else FXTYPE.CLOSE.value
-            fx_mode = FXMODE.BUY.value if bits[1] or bits[2] else FXMODE.SELL.value
-            return {'fx_type': fx_type, 'fx_mode': fx_mode}
-
         self.name = 'rsi'
         cols = self.df.columns.to_list()
         col_a = {'name': c for c in cols if c.startswith('RSI') and ('_A_' in c)}
@@ -141,35 +163,12 @@ class Fx:
         self.df[cb0] = self.df[cb].shift()
         self.df.dropna(inplace=True, ignore_index=True)
         # apply
-        self.df[['fx_type', 'fx_mode']] = DataFrame(
-            self.df[[ca0, cb0, ca, cb]].apply(rsi_x, axis=1).values.tolist()
-        )
+        self.df['fx_type'], self.df['fx_mode'] = rsi_x(*(self.df[c].to_numpy() for c in (ca0, cb0, ca, cb)))
 
     def _evaluate_stoch(self):
         """As evaluate function, takes DataFrame candles contains 'STOCHk...' column,
         return: (str)what_to_action, (str)mode_buy_or_sell.
         """
-        def kd_cross(values: list) -> bool:
-            k0, d0, k, d = values
-            return (k0-d0)*(k-d) < 0
-
-        def stoch_x(row):
-            bits = row.values.tolist()[-4:]
-            vals = row.values.tolist()[:4]
-            # SO scenarios and crossover
-            stk_scene = "".join([str(int(i)) for i in bits])
-            if stk_scene in ('0001', '1000', '1001'):
-                return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.BUY.value}
-            if stk_scene in ('0010', '0100', '0110'):
-                return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.SELL.value}
-            if stk_scene in ('0101',) and kd_cross(vals):
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
-            if stk_scene in ('1010',) and kd_cross(vals):
-                return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
-            # Other scenarios
-            # return {'fx_type': stk_scene, 'fx_mode': kd_cross(vals)}
-            return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
-
         self.name = 'stoch'
         # add signal
         cols = self.df.columns.to_list()
@@ -200,6 +199,5 @@ class Fx:
         self.df[cd0] = self.df[cd].shift()
         self.df.dropna(inplace=True, ignore_index=True)
         # apply
-        self.df[['fx_type', 'fx_mode']] = DataFrame(
-            self.df[[ck0, cd0, ck, cd, ca0, cb0, ca, cb]].apply(stoch_x, axis=1).values.tolist()
-        )
+        self.df['fx_type'], self.df['fx_mode'] = stoch_x(
+            *(self.df[c].to_numpy() for c in (ck0, cd0, ck, cd, ca0, cb0, ca, cb)))
@@ -0,0 +1,313 @@
+import json
+import math
+from collections import deque
+import numpy as np
+from classes.cache import Cache
+from classes.fx import emax_x, macd_x, rsi_x, stoch_x
+import logging
+LOGGER = logging.getLogger(__name__)
+
+
+class _State:
+    """Indicator whose attributes are its whole state, JSON friendly."""
+    def to_dict(self) -> dict:
+        return {k: (list(v) if isinstance(v, deque) else v.to_dict() if isinstance(v, _State) else v)
+                for k, v in vars(self).items()}
+
+    def load(self, state: dict):
+        for k, v in state.items():
+            current = getattr(self, k)
+            if isinstance(current, deque):
+                setattr(self, k, deque(v, maxlen=current.maxlen))
+            elif isinstance(current, _State):
+                current.load(v)
+            else:
+                setattr(self, k, v)
+        return self
+
+
+class EMA(_State):
+    """pandas_ta ema: SMA of the first length closes as seed, then alpha = 2 / (length + 1)."""
+    def __init__(self, length: int = 10, **kwargs) -> None:
+        self.length = length
+        self.n = 0
+        self.total = 0.0
+        self.value = None
+
+    def update(self, x: float):
+        if self.value is None:
+            self.n += 1
+            self.total += x
+            if self.n == self.length:
+                self.value = self.total / self.length
+        else:
+            alpha = 2 / (self.length + 1)
+            self.value = alpha * x + (1 - alpha) * self.value
+        return self.value
+
+
+class RMA(_State):
+    """pandas_ta rma: ewm(alpha=1/length, adjust=True, min_periods=length)."""
+    def __init__(self, length: int = 14) -> None:
+        self.length = length
+        self.n = 0
+        self.num = 0.0
+        self.den = 0.0
+
+    def update(self, x: float):
+        decay = 1 - 1 / self.length
+        self.num = x + decay * self.num
+        self.den = 1 + decay * self.den
+        self.n += 1
+        return self.num / self.den if self.n >= self.length else None
+
+
+class RSI(_State):
+    """pandas_ta rsi (Wilder): rma of gains over rma of gains and losses."""
+    def __init__(self, length: int = 14, scalar: float = 100, **kwargs) -> None:
+        self.scalar = scalar
+        self.prev = None
+        self.gain = RMA(length)
+        self.loss = RMA(length)
+
+    def update(self, close: float):
+        if self.prev is None:
+            self.prev = close
+            return None
+        diff, self.prev = close - self.prev, close
+        gain, loss = self.gain.update(max(diff, 0.0)), self.loss.update(max(-diff, 0.0))
+        if gain is None:
+            return None
+        return self.scalar * gain / (gain + loss) if gain + loss else math.nan
+
+
+class SMA(_State):
+    def __init__(self, length: int) -> None:
+        self.values = deque(maxlen=length)
+
+    def update(self, x: float):
+        self.values.append(x)
+        return sum(self.values) / len(self.values) if len(self.values) == self.values.maxlen else None
+
+
+class Stoch(_State):
+    """pandas_ta stoch: raw %K over k periods, smoothed by SMA(smooth_k), %D = SMA(d) of %K."""
+    def __init__(self, k: int = 14, d: int = 3, smooth_k: int = 3, **kwargs) -> None:
+        self.highs = deque(maxlen=k)
+        self.lows = deque(maxlen=k)
+        self.smooth = SMA(smooth_k)
+        self.signal = SMA(d)
+
+    def update(self, high: float, low: float, close: float):
+        self.highs.append(high)
+        self.lows.append(low)
+        if len(self.highs) < self.highs.maxlen:
+            return None, None
+        lowest = min(self.lows)
+        span = (max(self.highs) - lowest) or np.finfo(float).eps
+        k = self.smooth.update(100 * (close - lowest) / span)
+        if k is None:
+            return None, None
+        return k, self.signal.update(k)
+
+
+class MACD(_State):
+    """pandas_ta macd: EMA(fast) - EMA(slow), signal EMA of macd, histogram."""
+    def __init__(self, fast: int = 12, slow: int = 26, signal: int = 9, **kwargs) -> None:
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal = EMA(signal)
+
+    def update(self, close: float):
+        fast, slow = self.fast.update(close), self.slow.update(close)
+        if fast is None or slow is None:
+            return None, None, None
+        macd = fast - slow
+        signal = self.signal.update(macd)
+        if signal is None:
+            return macd, None, None
+        return macd, macd - signal, signal
+
+
+def _valid(value) -> bool:
+    return value is not None and not math.isnan(value)
+
+
+# spec keys that only change how an indicator is read, not how it is computed
+_READ_KEYS = ('signal_indicators', 'xa', 'xb')
+
+
+def _compute_key(spec: dict) -> str:
+    return json.dumps({k: v for k, v in spec.items() if k not in _READ_KEYS}, sort_keys=True)
+
+
+class _Group(_State, dict):
+    """Named indicators or signals, saved and loaded member by member."""
+    def to_dict(self) -> dict:
+        return {k: v.to_dict() for k, v in self.items()}
+
+    def load(self, state: dict):
+        for k, v in self.items():
+            v.load(state[k])
+        return self
+
+
+class IndicatorSet(_State):
+    """One indicator object per distinct computation of preset specs, each updated once a candle.
+    Specs differing only in their signal thresholds share their indicator."""
+    _kinds = {'ema': EMA, 'rsi': RSI, 'stoch': Stoch, 'macd': MACD}
+
+    def __init__(self, specs: list[dict]) -> None:
+        self.indicators = _Group()
+        for spec in specs:
+            key = _compute_key(spec)
+            if key not in self.indicators:
+                params = {k: v for k, v in spec.items() if k not in _READ_KEYS + ('kind',)}
+                self.indicators[key] = self._kinds[spec['kind']](**params)
+
+    def update(self, candle: dict) -> dict:
+        """Outputs of every indicator for one candle, by compute key."""
+        return {key: ind.update(candle['high'], candle['low'], candle['close']) if isinstance(ind, Stoch)
+                else ind.update(candle['close'])
+                for key, ind in self.indicators.items()}
+
+
+class PresetSignal(_State):
+    """Rows of one preset (initial.ind_presets) read from the outputs of an IndicatorSet.
+    Each row carries the pandas_ta column names, and the fx_type/fx_mode that Fx.evaluate
+    gives to the last row of the same candles."""
+    def __init__(self, indicator: str, tech: list[dict]) -> None:
+        self.name = indicator.lower()
+        self.tech = tech
+        self.prev = None
+        self.rows = deque(maxlen=2)
+
+    @property
+    def row(self):
+        """last row with a signal, None while warming up"""
+        return self.rows[-1] if self.rows else None
+
+    def _values(self, outputs: dict) -> dict:
+        row = {}
+        for spec in self.tech:
+            kind, output = spec['kind'], outputs[_compute_key(spec)]
+            if kind == 'ema':
+                row[f'EMA_{spec.get("length", 10)}'] = output
+            elif kind == 'rsi':
+                name = f'RSI_{spec.get("length", 14)}'
+                row[name] = rsi = output
+                if spec.get('signal_indicators'):
+                    xa, xb = spec.get('xa', 80), spec.get('xb', 20)
+                    row[f'{name}_A_{xa}'] = int(_valid(rsi) and rsi >= xa)
+                    row[f'{name}_B_{xb}'] = int(_valid(rsi) and rsi <= xb)
+            elif kind == 'stoch':
+                params = f'{spec.get("k", 14)}_{spec.get("d", 3)}_{spec.get("smooth_k", 3)}'
+                k, d = output
+                row[f'STOCHk_{params}'], row[f'STOCHd_{params}'] = k, d
+                xa, xb = spec.get('xa', 80), spec.get('xb', 20)
+                row[f'STOCHk_{params}_A_{xa}'] = int(_valid(k) and k >= xa)
+                row[f'STOCHk_{params}_B_{xb}'] = int(_valid(k) and k <= xb)
+            elif kind == 'macd':
+                params = f'{spec.get("fast", 12)}_{spec.get("slow", 26)}_{spec.get("signal", 9)}'
+                prev_h = self.prev.get(f'MACDh_{params}') if self.prev else None
+                macd, h, s = output
+                row[f'MACD_{params}'], row[f'MACDh_{params}'], row[f'MACDs_{params}'] = macd, h, s
+                if spec.get('signal_indicators'):
+                    above, was_below = _valid(h) and h > 0, _valid(prev_h) and prev_h < 0
+                    row[f'MACDh_{params}_XA_0'] = int(above and was_below)
+                    row[f'MACDh_{params}_XB_0'] = int(not above and not was_below)
+        return row
+
+    def _fx(self, prev: dict, row: dict) -> tuple[int, int]:
+        def cols(*parts):
+            return [c for c in row if c.startswith(parts[0]) and all(p in c for p in parts[1:])]
+
+        def arg(col, source):
+            return np.array([source[col]], dtype=float)
+
+        if self.name == 'emax':
+            ca, cb = cols('EMA')[0], cols('EMA')[-1]
+            fx = emax_x(arg(ca, prev), arg(cb, prev), arg(ca, row), arg(cb, row))
+        elif self.name == 'macd':
+            fx = macd_x(arg(cols('MACD', '_XA_')[0], row), arg(cols('MACD', '_XB_')[0], row))
+        elif self.name == 'rsi':
+            ca, cb = cols('RSI', '_A_')[0], cols('RSI', '_B_')[0]
+            fx = rsi_x(arg(ca, prev), arg(cb, prev), arg(ca, row), arg(cb, row))
+        else:
+            ck, cd = cols('STOCHk')[0], cols('STOCHd')[0]
+            ca, cb = cols('STOCH', '_A_')[0], cols('STOCH', '_B_')[0]
+            fx = stoch_x(*(arg(c, s) for s in (prev, row) for c in (ck, cd)),
+                         *(arg(c, s) for s in (prev, row) for c in (ca, cb)))
+        return int(fx[0][0]), int(fx[1][0])
+
+    def fold(self, candle: dict, outputs: dict):
+        """Row of the candle from indicator outputs, returned once it has a signal."""
+        values = self._values(outputs)
+        if not all(_valid(v) for v in values.values()):
+            return None
+        row = {'ctm': int(candle['ctm'])} | {k: float(candle[k]) for k in ('open', 'close', 'high', 'low', 'vol')}
+        row |= values
+        # like the shift and dropna of Fx, a signal needs the previous complete row (but macd)
+        if self.prev is not None or self.name == 'macd':
+            row['fx_type'], row['fx_mode'] = self._fx(self.prev, values)
+            self.rows.append(row)
+        self.prev = values
+        return row if 'fx_type' in row else None
+
+
+class MultiPresetEngine(_State):
+    """Presets of one symbol and timeframe updated one candle at a time, in O(1).
+    Indicators shared by presets (e.g. EMA 50 of EMAX 10/50 and 25/50) are computed once."""
+    def __init__(self, indicator: str, presets: dict[str, list[dict]]) -> None:
+        self.signature = {'indicator': indicator.lower(), 'presets': presets}
+        self.indicators = IndicatorSet([spec for tech in presets.values() for spec in tech])
+        self.signals = _Group({name: PresetSignal(indicator, tech) for name, tech in presets.items()})
+        self.last_ctm = 0
+
+    def update(self, candle: dict) -> dict:
+        """Fold one closed candle (normalised prices), return {preset: row with a signal or None}.
+        Candles not newer than the last one folded are ignored."""
+        if candle['ctm'] <= self.last_ctm:
+            return {}
+        self.last_ctm = int(candle['ctm'])
+        outputs = self.indicators.update({k: float(candle[k]) for k in ('close', 'high', 'low')})
+        return {name: signal.fold(candle, outputs) for name, signal in self.signals.items()}
+
+
+class IndicatorEngine(MultiPresetEngine):
+    """MultiPresetEngine of a single preset."""
+    def __init__(self, indicator: str, tech: list[dict]) -> None:
+        super().__init__(indicator, {'': tech})
+
+    @property
+    def rows(self):
+        return self.signals[''].rows
+
+    @property
+    def row(self):
+        return self.signals[''].row
+
+    def update(self, candle: dict):
+        """Fold one closed candle, return its row once it has a signal."""
+        return super().update(candle).get('')
+
+
+class IndicatorState:
+    """Indicator engine of one (mode, symbol, timeframe) and preset(s), persisted in Redis between runs."""
+    def __init__(self, mode: str, symbol: str, timeframe: int, preset: str, cache: Cache = None) -> None:
+        self.key: str = f'fx_state:{mode}_{symbol}_{timeframe}:{preset}'
+        self.cache: Cache = cache or Cache()
+        self.ttl_s: int = timeframe*172_800
+
+    def load(self, engine: MultiPresetEngine) -> MultiPresetEngine:
+        """engine with the saved state, unchanged when none was saved for its signature."""
+        try:
+            state = self.cache.get_key(self.key)
+        except TypeError:
+            return engine
+        if state.get('signature') != engine.signature:
+            return engine
+        return engine.load(state)
+
+    def save(self, engine: MultiPresetEngine):
+        self.cache.set_key(self.key, engine.to_dict(), ttl_s=self.ttl_s)
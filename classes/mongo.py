@@ -1,9 +1,14 @@
 import os
-from pymongo import MongoClient
-from pymongo.errors import BulkWriteError
+from itertools import islice
+import numpy as np
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import BulkWriteError, OperationFailure
+from classes.candles import CANDLE_DTYPE
 import logging
 logger = logging.getLogger('xtb.store')
 logger.setLevel(logging.DEBUG)
+# writeErrors code of a document already held under a unique index
+DUPLICATE_KEY = 11000
 
 
 class Mongo:
@@ -16,6 +21,7 @@ class Mongo:
             )
         )
         self.db = self.client[db]
+        self._indexed: set = set()
 
     def find_all(self, collection: str):
         try:
@@ -28,6 +34,46 @@ class Mongo:
         except TypeError as err:
             logger.error(err)
 
+    def ensure_ctm_index(self, collection: str):
+        """Unique ascending index on ctm, created once per collection and client."""
+        if collection in self._indexed:
+            return
+        try:
+            self.db[collection].create_index([('ctm', ASCENDING)], unique=True)
+        except OperationFailure as err:
+            logger.warning(f'({collection}) ctm index: {err}')
+        self._indexed.add(collection)
+
+    def find_range(self, collection: str, start_ctm: int = None, end_ctm: int = None,
+                   fields: tuple = CANDLE_DTYPE.names, batch_size: int = 10_000) -> dict:
+        """Candles with start_ctm <= ctm <= end_ctm as NumPy columns, sorted by the server.
+        Fields missing (or null) in a document read as 0."""
+        cols = {f: np.empty(0, dtype=CANDLE_DTYPE[f]) for f in fields}
+        try:
+            self.ensure_ctm_index(collection)
+            db_collection = self.db[collection]
+            ctm = {}
+            if start_ctm is not None:
+                ctm['$gte'] = start_ctm
+            if end_ctm is not None:
+                ctm['$lte'] = end_ctm
+            query = {'ctm': ctm} if ctm else {}
+            n = db_collection.count_documents(query)
+            cols = {f: np.empty(n, dtype=CANDLE_DTYPE[f]) for f in fields}
+            projection = {'_id': 0, **{f: 1 for f in fields}}
+            i = 0
+            with db_collection.find(query, projection, sort=[('ctm', ASCENDING)], batch_size=batch_size) as cursor:
+                # documents inserted after the count are left for the next read
+                while batch := list(islice(cursor, min(batch_size, n - i))):
+                    for f in fields:
+                        cols[f][i:i + len(batch)] = [doc.get(f) or 0 for doc in batch]
+                    i += len(batch)
+            cols = {f: c[:i] for f, c in cols.items()}
+            logger.debug(f'({collection}) found {i} in range')
+        except TypeError as err:
+            logger.error(err)
+        return cols
+
     def upsert_one(self, collection: str, match: dict, data: dict):
         n_upsert = -1
         try:
@@ -58,3 +104,17 @@ class Mongo:
             logger.error(err)
         finally:
             return n_inserted
+
+    def insert_new(self, collection: str, data: list) -> tuple[int, list[dict]]:
+        """Insert documents unordered, the ones already held under a unique index are skipped.
+        Returns nInserted and the writeErrors other than duplicate keys."""
+        try:
+            res = self.db[collection].insert_many(data, ordered=False)
+            return len(res.inserted_ids), []
+        except BulkWriteError as err:
+            errors = err.details.get('writeErrors', [])
+            failed = [e for e in errors if e.get('code') != DUPLICATE_KEY]
+            n_inserted = int(err.details.get('nInserted'))
+            logger.debug(f'({collection}) nInserted: {n_inserted}, duplicates: {len(errors) - len(failed)}, '
+                         f'writeErrors: {len(failed)}')
+            return n_inserted, failed
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ValidationInfo, field_validator
 from pydantic.dataclasses import dataclass
 from typing import Union, List
 
@@ -21,6 +21,8 @@ class Param:
     account: Account
     symbols: List[str]
     timeframe: int
+    # resample candles from the cached series of this finer timeframe, 0 to download timeframe
+    source_timeframe: int = 0
     breaker: bool = False
     signal: bool = False
     volume: float = 0.01
@@ -37,6 +39,14 @@ class Param:
             v = Account(v)
         return v
 
+    @field_validator('source_timeframe')
+    def source_timeframe_post_init(cls, v, info: ValidationInfo):
+        # whole source candles per bar, a window of bars is then CANDLE_WINDOW * ratio candles
+        timeframe = info.data.get('timeframe')
+        if v and timeframe and (v >= timeframe or timeframe % v):
+            raise ValueError(f'source_timeframe {v} does not divide timeframe {timeframe}')
+        return v
+
 
 class Profile(BaseModel):
     name: str
@@ -0,0 +1,41 @@
+from XTBApi.ratelimit import TokenBucket, MAX_RATE, MAX_BURST
+from classes.cache import Cache
+from redis.exceptions import ConnectionError
+import logging
+LOGGER = logging.getLogger(__name__)
+
+# refill and take tokens atomically, on Redis server time
+_RESERVE_LUA = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local tokens = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'level', 'ts')
+local level = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+level = math.min(capacity, level + (now - ts) * rate) - tokens
+redis.call('HSET', KEYS[1], 'level', tostring(level), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+if level >= 0 then
+    return '0'
+end
+return tostring(-level / rate)
+"""
+
+
+class RedisTokenBucket(TokenBucket):
+    """Token bucket kept in Redis, one budget shared by all workers using the same key.
+    Falls back to the in-process bucket while Redis is unreachable."""
+    def __init__(self, key: str, rate: float = MAX_RATE, capacity: int = MAX_BURST, cache: Cache = None) -> None:
+        super().__init__(rate, capacity)
+        self.key = f'ratelimit:{key}'
+        self.cache = cache or Cache()
+        self._reserve = self.cache.client.register_script(_RESERVE_LUA)
+
+    def reserve(self, tokens=1) -> float:
+        try:
+            return float(self._reserve(keys=[self.key], args=[self.rate, self.capacity, tokens]))
+        except ConnectionError as e:
+            LOGGER.error(e)
+            return super().reserve(tokens)
@@ -0,0 +1,80 @@
+import numpy as np
+import pytz
+from datetime import datetime, timedelta
+from classes.candles import CANDLE_DTYPE, merge
+
+# XTB server time, D1 and wider bars start at its midnight
+SERVER_TZ = pytz.timezone('Europe/Warsaw')
+HOUR_MS = 3_600_000
+DAY_MS = 24 * HOUR_MS
+WEEK_MS = 7 * DAY_MS
+# 1970-01-05, first Monday after epoch
+_MONDAY_MS = 4 * DAY_MS
+
+
+def _utc_offsets(ctms: np.ndarray) -> np.ndarray:
+    """UTC offset (ms) of server time at each ctm, looked up once per hour."""
+    hours, inverse = np.unique(ctms // HOUR_MS, return_inverse=True)
+    offsets = np.array([datetime.fromtimestamp(h * 3600, SERVER_TZ).utcoffset().total_seconds() * 1000
+                        for h in hours], dtype=np.int64)
+    return offsets[inverse]
+
+
+def _local_offsets(local: np.ndarray) -> np.ndarray:
+    """UTC offset (ms) of server time at each local bar start, looked up once per start."""
+    starts, inverse = np.unique(local, return_inverse=True)
+    offsets = np.array([SERVER_TZ.localize(datetime(1970, 1, 1) + timedelta(milliseconds=int(s)))
+                        .utcoffset().total_seconds() * 1000 for s in starts], dtype=np.int64)
+    return offsets[inverse]
+
+
+def bucket_starts(ctms: np.ndarray, timeframe: int) -> np.ndarray:
+    """ctm of the bar of timeframe (min) holding each ctm, aligned like XTB bars."""
+    ctms = np.asarray(ctms, dtype=np.int64)
+    period_ms = timeframe * 60_000
+    if period_ms <= HOUR_MS:
+        return ctms - ctms % period_ms
+    local = ctms + _utc_offsets(ctms)
+    if timeframe == 43_200:
+        starts = local.astype('datetime64[ms]').astype('datetime64[M]').astype('datetime64[ms]').astype(np.int64)
+    elif period_ms == WEEK_MS:
+        starts = local - (local - _MONDAY_MS) % WEEK_MS
+    else:
+        starts = local - local % period_ms
+    # the bar may start before a DST change, on the other offset
+    return starts - _local_offsets(starts)
+
+
+def resample(arr: np.ndarray, timeframe: int) -> np.ndarray:
+    """Bars of timeframe (min) from sorted finer candles, as a codec array."""
+    if not len(arr):
+        return np.empty(0, dtype=CANDLE_DTYPE)
+    starts = bucket_starts(arr['ctm'], timeframe)
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:] - 1, len(arr) - 1]
+    op = arr['open'].astype(np.int64)
+    bars = np.empty(len(first), dtype=CANDLE_DTYPE)
+    bars['ctm'] = starts[first]
+    bars['open'] = op[first]
+    bars['close'] = (op + arr['close'])[last] - op[first]
+    bars['high'] = np.maximum.reduceat(op + arr['high'], first) - op[first]
+    bars['low'] = np.minimum.reduceat(op + arr['low'], first) - op[first]
+    bars['vol'] = np.add.reduceat(arr['vol'].astype(np.float64), first)
+    return bars
+
+
+class Resampler:
+    """Incremental resampling of one finer series into bars of timeframe (min).
+    Only the finer candles of the bar in progress are kept between updates."""
+    def __init__(self, timeframe: int) -> None:
+        self.timeframe: int = timeframe
+        self._tail: np.ndarray = np.empty(0, dtype=CANDLE_DTYPE)
+
+    def update(self, candles: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """(completed bars, bar in progress) after adding finer candles, new or revised."""
+        fine = merge(self._tail, candles)
+        bars = resample(fine, self.timeframe)
+        if not len(bars):
+            return bars, bars
+        self._tail = fine[fine['ctm'] >= bars['ctm'][-1]].copy()
+        return bars[:-1], bars[-1:]
@@ -0,0 +1,72 @@
+import time
+import pytest
+fakeredis = pytest.importorskip('fakeredis')
+mongomock = pytest.importorskip('mongomock')
+from pymongo.errors import BulkWriteError
+from classes.archive import archive, get_watermark
+from classes.cache import Cache, CandleSeries, CandleLRU
+from classes.mongo import Mongo
+
+TF = 15
+MINUTES_MS = TF * 60_000
+KEY_GROUP = f'demo_EURUSD_{TF}'
+
+
+def _stores():
+    db = Mongo.__new__(Mongo)
+    db.client = mongomock.MongoClient()
+    db.db = db.client['test']
+    db._indexed = set()
+    cache = Cache(decode_responses=False)
+    cache.client = fakeredis.FakeRedis()
+    return db, cache
+
+
+def _write(cache, n):
+    """n candles up to the bar in progress, as indexes of their ctm"""
+    last = int(time.time()) * 1000 // MINUTES_MS
+    CandleSeries('demo', 'EURUSD', TF, cache=cache, lru=CandleLRU()).write(
+        [{'ctm': i * MINUTES_MS, 'open': 100_000 + i, 'close': 5, 'high': 9, 'low': -3, 'vol': 1.0}
+         for i in range(last - n + 1, last + 1)])
+    return last
+
+
+def test_open_bar_excluded():
+    db, cache = _stores()
+    last = _write(cache, 10)
+    assert archive(db, 'demo', 'EURUSD', TF, cache=cache) == 9
+    assert get_watermark(db, KEY_GROUP) == (last - 1) * MINUTES_MS
+    assert db.db[KEY_GROUP].count_documents({'ctm': last * MINUTES_MS}) == 0
+    # nothing closed since
+    assert archive(db, 'demo', 'EURUSD', TF, cache=cache) == 0
+
+
+def test_replay_after_crash():
+    db, cache = _stores()
+    last = _write(cache, 10)
+    archive(db, 'demo', 'EURUSD', TF, cache=cache)
+    # the watermark update was lost, the candles are shipped again
+    db.db['watermarks'].delete_many({})
+    assert archive(db, 'demo', 'EURUSD', TF, cache=cache) == 0
+    assert db.db[KEY_GROUP].count_documents({}) == 9
+    assert get_watermark(db, KEY_GROUP) == (last - 1) * MINUTES_MS
+
+
+def test_watermark_stops_at_failed_candle(monkeypatch):
+    db, cache = _stores()
+    last = _write(cache, 10)
+    insert_many = mongomock.Collection.insert_many
+
+    def failing(self, documents, ordered=True, **kwargs):
+        documents = list(documents)
+        insert_many(self, documents[:3] + documents[4:], ordered=ordered, **kwargs)
+        raise BulkWriteError({'nInserted': len(documents) - 1, 'writeErrors': [
+            {'index': 3, 'code': 121, 'errmsg': 'Document failed validation'}]})
+    monkeypatch.setattr(mongomock.Collection, 'insert_many', failing)
+    assert archive(db, 'demo', 'EURUSD', TF, cache=cache) == 8
+    assert get_watermark(db, KEY_GROUP) == (last - 7) * MINUTES_MS
+    monkeypatch.undo()
+    # retried from the failed candle, the ones after it are duplicates
+    assert archive(db, 'demo', 'EURUSD', TF, cache=cache) == 1
+    assert db.db[KEY_GROUP].count_documents({}) == 9
+    assert get_watermark(db, KEY_GROUP) == (last - 1) * MINUTES_MS
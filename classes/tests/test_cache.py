@@ -0,0 +1,70 @@
+import threading
+import time
+import numpy as np
+import pytest
+fakeredis = pytest.importorskip('fakeredis')
+from classes.cache import Cache, CandleSeries, CandleLRU
+from classes.resample import bucket_starts
+
+TF = 15
+MINUTES_MS = TF * 60_000
+# bars per window, as app.CANDLE_WINDOW
+CANDLE_WINDOW = 400
+
+
+def _series(client=None, **kwargs) -> CandleSeries:
+    cache = Cache(decode_responses=False)
+    cache.client = client or fakeredis.FakeRedis()
+    return CandleSeries('demo', 'EURUSD', TF, cache=cache, lru=CandleLRU(), **kwargs)
+
+
+def _first(n):
+    """index of the first of n candles ending now, within the TTL of the series"""
+    return int(time.time()) * 1000 // MINUTES_MS - n
+
+
+def _rate_infos(first, n, open_=100_000):
+    return [{'ctm': (first + i) * MINUTES_MS, 'open': open_ + i, 'close': 5, 'high': 9, 'low': -3, 'vol': 1.0}
+            for i in range(n)]
+
+
+def test_write_merges_by_ctm():
+    series = _series()
+    now = _first(304)
+    series.write(_rate_infos(now, 300))
+    series.write(_rate_infos(now + 299, 5, open_=1))
+    arr = series.read()
+    assert len(arr) == 304
+    assert (np.diff(arr['ctm']) == MINUTES_MS).all()
+    assert arr['open'][-5] == 1
+    assert series.last_ctm() == (now + 303) * MINUTES_MS
+
+
+def test_concurrent_writes_keep_every_candle():
+    series = [_series(fakeredis.FakeRedis(server=server)) for server in [fakeredis.FakeServer()] for _ in range(8)]
+    first = _first(800)
+
+    def write(i):
+        for j in range(10):
+            series[i].write(_rate_infos(first + 80 * j + i * 10, 10))
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(series[0].read()) == 800
+
+
+def test_resampled_window_full():
+    h4 = 240
+    client = fakeredis.FakeRedis()
+    # the source series sized from the target, as app.Result.get_candles
+    series = _series(client, ttl_s=h4*172_800)
+    last = int(bucket_starts([int(time.time()) * 1000], TF)[0]) // MINUTES_MS - 1
+    n = CANDLE_WINDOW * h4 // TF + 2 * h4 // TF
+    series.write(_rate_infos(last - n + 1, n))
+    # a profile on the native timeframe writing the same series keeps its history
+    _series(client).write(_rate_infos(last, 1))
+    assert series.first_ctm() == (last - n + 1) * MINUTES_MS
+    window = series.window(last * MINUTES_MS, CANDLE_WINDOW, 5, timeframe=h4)
+    assert len(window['ctm']) == CANDLE_WINDOW
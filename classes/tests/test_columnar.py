@@ -0,0 +1,55 @@
+import os
+import numpy as np
+from classes.candles import CANDLE_DTYPE
+from classes.columnar import ColumnarStore
+
+MINUTES_MS = 15 * 60_000
+
+
+def _rate_infos(first, n):
+    return [{'ctm': (first + i) * MINUTES_MS, 'open': 100_000 + first + i, 'close': 5, 'high': 9, 'low': -3, 'vol': 1.0}
+            for i in range(n)]
+
+
+def test_append_and_range(tmp_path):
+    store = ColumnarStore('demo', 'EURUSD', 15, root=str(tmp_path))
+    assert len(store) == 0 and store.last_ctm() == 0
+    assert len(store.range()['ctm']) == 0
+    assert store.append(_rate_infos(100, 10)[::-1]) == 10
+    # only candles newer than the last stored one are appended, once
+    assert store.append(_rate_infos(105, 10) + _rate_infos(114, 2)) == 6
+    assert len(store) == 16 and store.last_ctm() == 115 * MINUTES_MS
+    cols = store.range(start_ctm=103 * MINUTES_MS, end_ctm=106 * MINUTES_MS + 1)
+    assert cols['ctm'].tolist() == [(103 + i) * MINUTES_MS for i in range(4)]
+    assert isinstance(cols['open'], np.memmap) and not cols['open'].flags.writeable
+
+
+def test_uncommitted_tail_dropped(tmp_path):
+    store = ColumnarStore('demo', 'EURUSD', 15, root=str(tmp_path))
+    store.append(_rate_infos(100, 10))
+    # a crash between the column writes and the meta.json commit leaves a torn tail
+    with open(os.path.join(store.path, 'open.bin'), 'ab') as f:
+        f.write(b'\0' * CANDLE_DTYPE['open'].itemsize * 3)
+    assert len(store.columns()['open']) == 10
+    store.append(_rate_infos(110, 2))
+    assert store.columns()['open'].tolist() == [100_100 + i for i in range(12)]
+
+
+def test_merge_fills_holes(tmp_path):
+    store = ColumnarStore('demo', 'EURUSD', 15, root=str(tmp_path))
+    store.append(_rate_infos(100, 3) + _rate_infos(106, 4))
+    before = store.columns()
+    # repaired hole 103-105, one candle already stored and two newer ones
+    assert store.merge(_rate_infos(102, 4) + _rate_infos(110, 2)) == 5
+    assert store.columns()['ctm'].tolist() == [(100 + i) * MINUTES_MS for i in range(12)]
+    assert store.columns()['open'].tolist() == [100_100 + i for i in range(12)]
+    assert store.last_ctm() == 111 * MINUTES_MS
+    # readers of the previous generation keep their maps
+    assert before['ctm'].tolist() == [i * MINUTES_MS for i in (100, 101, 102, 106, 107, 108, 109)]
+    assert store.append(_rate_infos(112, 1)) == 1
+    assert store.merge(_rate_infos(100, 13)) == 0
+    assert len(store) == 13
+    store.merge(_rate_infos(90, 2))
+    store.merge(_rate_infos(95, 2))
+    assert len(store) == 17
+    assert not os.path.exists(store._column('ctm', 1))
@@ -0,0 +1,66 @@
+import numpy as np
+from XTBApi.hours import TradingHours, DAY
+from classes.coverage import Coverage, runs
+
+MINUTES_MS = 15 * 60_000
+HOUR = 3600
+# 2024-01-01 00:00 UTC, a Monday
+MONDAY_MS = 1_704_067_200_000
+
+
+class _Cache:
+    def __init__(self):
+        self.data = {}
+
+    def set_key(self, key, value, **kwargs):
+        self.data[key] = value
+
+    def get_key(self, key):
+        if key not in self.data:
+            raise TypeError
+        return self.data[key]
+
+
+def _coverage(cache=None) -> Coverage:
+    return Coverage('demo', 'GOLD', 15, cache=cache or _Cache())
+
+
+def test_runs():
+    ctms = np.array([0, 1, 2, 5, 6, 9]) * MINUTES_MS
+    assert runs(ctms, MINUTES_MS) == [[0, 2 * MINUTES_MS], [5 * MINUTES_MS, 6 * MINUTES_MS],
+                                      [9 * MINUTES_MS, 9 * MINUTES_MS]]
+    assert runs(np.array([]), MINUTES_MS) == []
+
+
+def test_gaps():
+    coverage = _coverage()
+    coverage.add_ctms(np.array([2, 3, 4, 8, 9]) * MINUTES_MS)
+    coverage.add(5 * MINUTES_MS, 5 * MINUTES_MS)  # adjacent, merged
+    assert coverage.intervals == [[2 * MINUTES_MS, 5 * MINUTES_MS], [8 * MINUTES_MS, 9 * MINUTES_MS]]
+    assert coverage.gaps(0, 12 * MINUTES_MS + 1) == [
+        (0, MINUTES_MS), (6 * MINUTES_MS, 7 * MINUTES_MS), (10 * MINUTES_MS, 12 * MINUTES_MS)]
+    assert coverage.gaps(2 * MINUTES_MS, 5 * MINUTES_MS) == []
+
+
+def test_gaps_while_open():
+    hours = TradingHours()
+    hours.load([{'symbol': 'GOLD', 'quotes': [],
+                 'trading': [{'day': d, 'fromT': 0, 'toT': DAY} for d in range(1, 6)]}])
+    coverage = _coverage()
+    saturday, monday = MONDAY_MS + 5 * DAY * 1000, MONDAY_MS + 7 * DAY * 1000
+    # holes are trimmed to the candles touching a session, weekend-only ones dropped
+    assert coverage.gaps(saturday + 6 * HOUR * 1000, monday + HOUR * 1000, hours=hours) == [
+        (monday, monday + HOUR * 1000)]
+    assert coverage.gaps(saturday - HOUR * 1000, saturday + 6 * HOUR * 1000, hours=hours) == [
+        (saturday - HOUR * 1000, saturday)]
+    assert coverage.gaps(saturday + HOUR * 1000, monday - HOUR * 1000, hours=hours) == []
+
+
+def test_save_load():
+    cache = _Cache()
+    assert not _coverage(cache).load()
+    coverage = _coverage(cache)
+    coverage.add(0, 3 * MINUTES_MS)
+    coverage.save(ttl_s=60)
+    loaded = _coverage(cache)
+    assert loaded.load() and loaded.intervals == [[0, 3 * MINUTES_MS]]
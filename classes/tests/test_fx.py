@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+from pandas import DataFrame
+import classes.fx
+from classes.fx import Fx, FXTYPE, FXMODE, rsi_x
+
+TECH = [{"kind": "stoch", "k": 14, "d": 3, "smooth_k": 3, "xa": 80, "xb": 20}]
+
+
+def _candles(n=600, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(scale=0.5, size=n).cumsum()
+    spread = rng.random(n)
+    return DataFrame({'ctm': 60_000 * np.arange(1, n + 1), 'open': close - spread / 2, 'close': close,
+                      'high': close + spread, 'low': close - spread, 'vol': rng.integers(1, 100, n) * 1.0})
+
+
+def _indicators(candles):
+    """indicator and signal columns named as pandas_ta would, computed with pandas only"""
+    df = candles.copy()
+    close = df['close']
+    df['EMA_10'] = close.ewm(span=10, adjust=False).mean()
+    df['EMA_25'] = close.ewm(span=25, adjust=False).mean()
+    hist = close.ewm(span=12, adjust=False).mean() - close.ewm(span=26, adjust=False).mean()
+    hist -= hist.ewm(span=9, adjust=False).mean()
+    df['MACDh_12_26_9_XA_0'] = ((hist.shift() < 0) & (hist > 0)).astype(int)
+    df['MACDh_12_26_9_XB_0'] = ((hist.shift() > 0) & (hist < 0)).astype(int)
+    diff = close.diff()
+    gain = diff.clip(lower=0).ewm(alpha=1 / 14).mean()
+    loss = (-diff).clip(lower=0).ewm(alpha=1 / 14).mean()
+    rsi = 100 * gain / (gain + loss)
+    df['RSI_14_A_65'] = (rsi > 65).astype(int)
+    df['RSI_14_B_35'] = (rsi < 35).astype(int)
+    lowest, highest = df['low'].rolling(14).min(), df['high'].rolling(14).max()
+    df['STOCHk_14_3_3'] = (100 * (close - lowest) / (highest - lowest)).rolling(3).mean()
+    df['STOCHd_14_3_3'] = df['STOCHk_14_3_3'].rolling(3).mean()
+    return df.dropna(ignore_index=True)
+
+
+def _add_signal(df, ind_name, **kwargs):
+    """threshold signal columns of the stochastic, as pandas_ta signals"""
+    df = df.copy()
+    df[f'{ind_name}_A_{kwargs["xa"]}'] = (df[ind_name] > kwargs['xa']).astype(int)
+    df[f'{ind_name}_B_{kwargs["xb"]}'] = (df[ind_name] < kwargs['xb']).astype(int)
+    return df
+
+
+# the row-wise evaluators the kernels replaced, reading signal bits as integers
+
+def _emax_row(row):
+    f1, s1, f2, s2 = row.values.tolist()
+    if f1 > s1 and f2 < s2:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
+    if f1 < s1 and f2 > s2:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
+    return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
+
+
+def _macd_row(row):
+    xa, xb = row.values.tolist()
+    if xa:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
+    if xb:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
+    return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
+
+
+def _rsi_row(row):
+    bits = [int(i) for i in row.values.tolist()]
+    if sum(bits) != 1:
+        if "".join((str(i) for i in bits)) == '0110':
+            return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.BUY.value}
+        if "".join((str(i) for i in bits)) == '1001':
+            return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.SELL.value}
+        return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
+    fx_type = FXTYPE.OPEN.value if bits[0] or bits[1] else FXTYPE.CLOSE.value
+    fx_mode = FXMODE.BUY.value if bits[1] or bits[2] else FXMODE.SELL.value
+    return {'fx_type': fx_type, 'fx_mode': fx_mode}
+
+
+def _stoch_row(row):
+    bits = row.values.tolist()[-4:]
+    k0, d0, k, d = row.values.tolist()[:4]
+    stk_scene = "".join([str(int(i)) for i in bits])
+    if stk_scene in ('0001', '1000', '1001'):
+        return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.BUY.value}
+    if stk_scene in ('0010', '0100', '0110'):
+        return {'fx_type': FXTYPE.CLOSE.value, 'fx_mode': FXMODE.SELL.value}
+    if stk_scene in ('0101',) and (k0-d0)*(k-d) < 0:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.BUY.value}
+    if stk_scene in ('1010',) and (k0-d0)*(k-d) < 0:
+        return {'fx_type': FXTYPE.OPEN.value, 'fx_mode': FXMODE.SELL.value}
+    return {'fx_type': FXTYPE.STAY.value, 'fx_mode': FXMODE.NA.value}
+
+
+ROWWISE = {
+    'emax': (_emax_row, ['prevEMA_10', 'prevEMA_25', 'EMA_10', 'EMA_25']),
+    'macd': (_macd_row, ['MACDh_12_26_9_XA_0', 'MACDh_12_26_9_XB_0']),
+    'rsi': (_rsi_row, ['prevRSI_14_A_65', 'prevRSI_14_B_35', 'RSI_14_A_65', 'RSI_14_B_35']),
+    'stoch': (_stoch_row, ['prevSTOCHk_14_3_3', 'prevSTOCHd_14_3_3', 'STOCHk_14_3_3', 'STOCHd_14_3_3',
+                           'prevSTOCHk_14_3_3_A_80', 'prevSTOCHk_14_3_3_B_20',
+                           'STOCHk_14_3_3_A_80', 'STOCHk_14_3_3_B_20']),
+}
+
+
+@pytest.mark.parametrize('indicator', list(ROWWISE))
+def test_kernels_match_rowwise(indicator, monkeypatch):
+    monkeypatch.setattr(classes.fx, '_add_signal', _add_signal)
+    fx = Fx(indicator=indicator, tech=TECH)
+    fx.df = _indicators(_candles())
+    getattr(Fx, f'_evaluate_{indicator}')(fx)
+    func, cols = ROWWISE[indicator]
+    expected = DataFrame(fx.df[cols].apply(func, axis=1).values.tolist())
+    assert (fx.df['fx_type'] != FXTYPE.STAY.value).any()
+    assert fx.df['fx_type'].tolist() == expected['fx_type'].tolist()
+    assert fx.df['fx_mode'].tolist() == expected['fx_mode'].tolist()
+
+
+@pytest.mark.parametrize('bits, expected', [
+    ((0, 1, 1, 0), (FXTYPE.CLOSE, FXMODE.BUY)),
+    ((1, 0, 0, 1), (FXTYPE.CLOSE, FXMODE.SELL)),
+    ((1, 0, 0, 0), (FXTYPE.OPEN, FXMODE.SELL)),
+    ((0, 1, 0, 0), (FXTYPE.OPEN, FXMODE.BUY)),
+    ((0, 0, 1, 0), (FXTYPE.CLOSE, FXMODE.BUY)),
+    ((0, 0, 0, 1), (FXTYPE.CLOSE, FXMODE.SELL)),
+    ((1, 0, 1, 0), (FXTYPE.STAY, FXMODE.NA)),
+    ((0, 0, 0, 0), (FXTYPE.STAY, FXMODE.NA)),
+])
+def test_rsi_bits(bits, expected):
+    fx_type, fx_mode = rsi_x(*(np.array([b], dtype=float) for b in bits))
+    assert (fx_type[0], fx_mode[0]) == (expected[0].value, expected[1].value)
+
+
+def test_rsi_every_pattern_matches_rowwise():
+    patterns = np.array([[(i >> s) & 1 for s in (3, 2, 1, 0)] for i in range(16)])
+    fx_type, fx_mode = rsi_x(*patterns.T.astype(float))
+    expected = DataFrame(DataFrame(patterns).apply(_rsi_row, axis=1).values.tolist())
+    assert fx_type.tolist() == expected['fx_type'].tolist()
+    assert fx_mode.tolist() == expected['fx_mode'].tolist()
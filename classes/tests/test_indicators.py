@@ -0,0 +1,117 @@
+import json
+import numpy as np
+import pytest
+from pandas import DataFrame
+from classes.fx import Fx, ta
+from classes.indicators import EMA, RSI, Stoch, MACD, IndicatorEngine, MultiPresetEngine
+
+needs_ta = pytest.mark.skipif(ta is None, reason='pandas_ta not installed')
+
+PRESETS = {
+    'emax': [{"kind": "ema", "length": 10}, {"kind": "ema", "length": 25}],
+    'rsi': [{"kind": "rsi", "length": 14, "signal_indicators": True, "xa": 65, "xb": 35}],
+    'stoch': [{"kind": "stoch", "k": 14, "d": 3, "smooth_k": 3, "xa": 80, "xb": 20}],
+    'macd': [{"kind": "macd", "signal_indicators": True}],
+}
+
+
+def _candles(n=600, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(scale=0.5, size=n).cumsum()
+    spread = rng.random(n)
+    return DataFrame({'ctm': 60_000 * np.arange(1, n + 1), 'open': close - spread / 2, 'close': close,
+                      'high': close + spread, 'low': close - spread, 'vol': rng.integers(1, 100, n) * 1.0})
+
+
+@needs_ta
+@pytest.mark.parametrize('indicator', list(PRESETS))
+def test_engine_matches_pandas_ta(indicator):
+    candles = _candles()
+    fx = Fx(indicator=indicator, tech=PRESETS[indicator])
+    fx.evaluate(candles)
+    engine = IndicatorEngine(indicator, PRESETS[indicator])
+    rows = [engine.update(c) for c in candles.to_dict('records')]
+    rows = DataFrame([r for r in rows if r is not None])
+    assert rows['ctm'].tolist() == fx.df['ctm'].tolist()
+    for col in rows.columns:
+        assert np.allclose(rows[col], fx.df[col], rtol=1e-9), col
+
+
+def _ema(x, length):
+    """SMA seed, then the recursive EMA"""
+    out = np.full(len(x), np.nan)
+    valid = np.flatnonzero(~np.isnan(x))[0]
+    out[valid + length - 1] = x[valid:valid + length].mean()
+    alpha = 2 / (length + 1)
+    for i in range(valid + length, len(x)):
+        out[i] = alpha * x[i] + (1 - alpha) * out[i - 1]
+    return out
+
+
+def _rma(x, length):
+    """adjusted ewm with alpha 1/length, as weighted means of every value so far"""
+    out = np.full(len(x), np.nan)
+    for i in range(length - 1, len(x)):
+        weights = (1 - 1 / length) ** np.arange(i, -1, -1)
+        out[i] = (weights * x[:i + 1]).sum() / weights.sum()
+    return out
+
+
+def _rolling(x, n, func):
+    out = np.full(len(x), np.nan)
+    for i in range(n - 1, len(x)):
+        out[i] = func(x[i - n + 1:i + 1])
+    return out
+
+
+def _outputs(indicator, *columns):
+    values = [indicator.update(*row) for row in zip(*columns)]
+    return np.array([[np.nan if v is None else v for v in (r if isinstance(r, tuple) else (r,))]
+                     for r in values]).T
+
+
+def test_ema_fixed_values():
+    ema = _outputs(EMA(3), [1.0, 2.0, 3.0, 4.0, 5.0])[0]
+    assert np.isnan(ema[:2]).all() and ema[2:].tolist() == [2.0, 3.0, 4.0]
+
+
+def test_indicators_match_reference():
+    candles = _candles(n=200)
+    close, high, low = (candles[c].to_numpy() for c in ('close', 'high', 'low'))
+    assert np.allclose(_outputs(EMA(10), close)[0], _ema(close, 10), equal_nan=True)
+    diff = np.diff(close)
+    gain, loss = _rma(np.maximum(diff, 0), 14), _rma(np.maximum(-diff, 0), 14)
+    rsi = np.r_[np.nan, 100 * gain / (gain + loss)]
+    assert np.allclose(_outputs(RSI(14), close)[0], rsi, equal_nan=True)
+    lowest, highest = _rolling(low, 14, np.min), _rolling(high, 14, np.max)
+    k = _rolling(100 * (close - lowest) / (highest - lowest), 3, np.mean)
+    d = _rolling(k, 3, np.mean)
+    assert np.allclose(_outputs(Stoch(14, 3, 3), high, low, close), [k, d], equal_nan=True)
+    macd = _ema(close, 12) - _ema(close, 26)
+    signal = _ema(macd, 9)
+    assert np.allclose(_outputs(MACD(12, 26, 9), close), [macd, macd - signal, signal], equal_nan=True)
+
+
+def test_engine_state_roundtrip():
+    candles = _candles().to_dict('records')
+    whole = IndicatorEngine('stoch', PRESETS['stoch'])
+    for c in candles:
+        whole.update(c)
+    split = IndicatorEngine('stoch', PRESETS['stoch'])
+    for c in candles[:300]:
+        split.update(c)
+    resumed = IndicatorEngine('stoch', PRESETS['stoch']).load(json.loads(json.dumps(split.to_dict())))
+    for c in candles[250:]:  # candles already folded are ignored
+        resumed.update(c)
+    assert resumed.row == whole.row
+
+
+def test_presets_share_indicators():
+    candles = _candles().to_dict('records')
+    presets = {'10_25': PRESETS['emax'], '25_50': [{"kind": "ema", "length": 25}, {"kind": "ema", "length": 50}]}
+    engine = MultiPresetEngine('emax', presets)
+    assert len(engine.indicators.indicators) == 3
+    singles = {name: IndicatorEngine('emax', tech) for name, tech in presets.items()}
+    for c in candles:
+        rows = engine.update(c)
+        assert rows == {name: single.update(c) for name, single in singles.items()}
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+mongomock = pytest.importorskip('mongomock')
+from classes.mongo import Mongo
+
+MINUTES_MS = 15 * 60_000
+
+
+def _mongo() -> Mongo:
+    db = Mongo.__new__(Mongo)
+    db.client = mongomock.MongoClient()
+    db.db = db.client['test']
+    db._indexed = set()
+    return db
+
+
+def _docs(first, n):
+    return [{'ctm': (first + i) * MINUTES_MS, 'ctmString': '', 'open': 100_000 + i, 'close': 5,
+             'high': 9, 'low': -3, 'vol': 2.0} for i in range(n)]
+
+
+def test_find_range():
+    db = _mongo()
+    docs = _docs(100, 50)
+    db.insert_list_of_dict('demo_EURUSD_15', docs[::-1])
+    cols = db.find_range('demo_EURUSD_15', start_ctm=110 * MINUTES_MS, end_ctm=119 * MINUTES_MS, batch_size=3)
+    assert cols['ctm'].tolist() == [(110 + i) * MINUTES_MS for i in range(10)]
+    assert cols['open'].dtype == np.int64 and cols['open'][0] == 100_010
+    assert len(db.find_range('demo_EURUSD_15')['ctm']) == 50
+    assert db.db['demo_EURUSD_15'].index_information()['ctm_1']['unique']
+
+
+def test_find_range_missing_fields():
+    db = _mongo()
+    docs = _docs(100, 3)
+    del docs[1]['vol']
+    docs[2]['high'] = None
+    db.insert_list_of_dict('demo_EURUSD_15', docs)
+    cols = db.find_range('demo_EURUSD_15')
+    assert cols['vol'].tolist() == [2.0, 0.0, 2.0]
+    assert cols['high'].tolist() == [9, 9, 0]
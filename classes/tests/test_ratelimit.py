@@ -0,0 +1,42 @@
+import pytest
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+from classes.cache import Cache
+from classes.ratelimit import RedisTokenBucket
+
+
+def _cache(server) -> Cache:
+    cache = Cache()
+    cache.client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    return cache
+
+
+def test_budget_shared_by_key():
+    server = fakeredis.FakeServer()
+    buckets = [RedisTokenBucket('user', rate=10, capacity=3, cache=_cache(server)) for _ in range(2)]
+    assert [buckets[i % 2].reserve() for i in range(3)] == [0.0, 0.0, 0.0]
+    # the 4th and 5th tokens are owed by either worker, in order
+    assert buckets[0].reserve() == pytest.approx(0.1, abs=0.02)
+    assert buckets[1].reserve() == pytest.approx(0.2, abs=0.02)
+    assert RedisTokenBucket('other', rate=10, capacity=3, cache=_cache(server)).reserve() == 0.0
+
+
+def test_refill_capped():
+    cache = _cache(fakeredis.FakeServer())
+    bucket = RedisTokenBucket('user', rate=10, capacity=3, cache=cache)
+    now = float(cache.client.time()[0])
+    # 2 tokens owed, 10 s ago: refilled up to the capacity only
+    cache.client.hset(bucket.key, mapping={'level': '-2', 'ts': str(now - 10)})
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.reserve() > 0
+    assert 0 < cache.client.ttl(bucket.key) <= 61
+
+
+def test_fallback_while_unreachable():
+    server = fakeredis.FakeServer()
+    bucket = RedisTokenBucket('user', rate=10, capacity=2, cache=_cache(server))
+    server.connected = False
+    assert [bucket.reserve() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
+    server.connected = True
+    assert bucket.reserve() == 0.0
@@ -0,0 +1,47 @@
+from datetime import datetime, timezone
+import numpy as np
+from classes.candles import CANDLE_DTYPE
+from classes.resample import bucket_starts, resample, Resampler
+
+HOUR_MS = 3_600_000
+
+
+def _ms(*args):
+    return int(datetime(*args, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+def test_buckets_around_dst():
+    # Europe/Warsaw: CET -> CEST on 2024-03-31 01:00 UTC, back on 2024-10-27 01:00 UTC
+    d1 = bucket_starts([_ms(2024, 3, 31, 12), _ms(2024, 4, 1, 12), _ms(2024, 10, 27, 12)], 1440)
+    assert d1.tolist() == [_ms(2024, 3, 30, 23), _ms(2024, 3, 31, 22), _ms(2024, 10, 26, 22)]
+    h4 = bucket_starts([_ms(2024, 10, 27, 0, 30), _ms(2024, 10, 27, 3)], 240)
+    assert h4.tolist() == [_ms(2024, 10, 26, 22), _ms(2024, 10, 27, 3)]
+    assert bucket_starts([_ms(2024, 4, 3, 12)], 10080).tolist() == [_ms(2024, 3, 31, 22)]
+    assert bucket_starts([_ms(2024, 4, 15, 12)], 43200).tolist() == [_ms(2024, 3, 31, 22)]
+    assert bucket_starts([_ms(2024, 3, 31, 1, 20)], 15).tolist() == [_ms(2024, 3, 31, 1, 15)]
+
+
+def _hourly(first_ms, n):
+    arr = np.zeros(n, dtype=CANDLE_DTYPE)
+    arr['ctm'] = first_ms + HOUR_MS * np.arange(n)
+    arr['open'] = 1000 + np.arange(n)
+    arr['close'], arr['high'], arr['low'], arr['vol'] = 1, 3, -2, 1.0
+    return arr
+
+
+def test_resample_short_day():
+    bars = resample(_hourly(_ms(2024, 3, 30, 23), 47), 1440)
+    # the day of the change to summer time has 23 hours
+    assert bars['ctm'].tolist() == [_ms(2024, 3, 30, 23), _ms(2024, 3, 31, 22)]
+    assert bars['vol'].tolist() == [23.0, 24.0]
+    assert bars['open'][1] == 1023 and bars['close'][1] == 1046 + 1 - 1023
+    assert bars['high'][0] == 1022 + 3 - 1000 and bars['low'][0] == -2
+
+
+def test_resampler_incremental():
+    hourly = _hourly(_ms(2024, 3, 30, 23), 47)
+    resampler = Resampler(1440)
+    done, partial = resampler.update(hourly[:30])
+    assert done['ctm'].tolist() == [_ms(2024, 3, 30, 23)] and partial['vol'].tolist() == [7.0]
+    done, partial = resampler.update(hourly[30:])
+    assert len(done) == 0 and partial['vol'].tolist() == [24.0]
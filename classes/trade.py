@@ -22,8 +22,7 @@ class Trade:
 
     def trigger_close(self, symbol, mode):
         self.client.update_trades()
-        orders = {k: trans.order_id
-                  for k, trans in self.client.trade_rec.items() if trans.symbol == symbol and trans.mode == mode}
+        orders = {trans.order_id: trans.order_id for trans in self.client.trades.by_symbol(symbol, mode)}
         LOGGER.debug(f'Order to be closed: {orders}')
         res = {}
         for k, order_id in orders.items():
@@ -37,12 +36,9 @@ class Trade:
         self.client.update_trades()
         if self.client.trade_rec:
             try:
-                cur = {}
                 new = {k: v.trans_dict for k, v in self.client.trade_rec.items()}
                 cache = Cache()
-                if cache.client.exists(f"trades_cur:{account}"):
-                    cur = cache.get_key(f"trades_cur:{account}")
-                cache.set_key(f"trades_pre:{account}", cur)
-                cache.set_key(f"trades_cur:{account}", new)
+                cur = cache.get_many([f"trades_cur:{account}"])[f"trades_cur:{account}"] or {}
+                cache.set_many({f"trades_pre:{account}": cur, f"trades_cur:{account}": new})
             except ConnectionError as e:
                 LOGGER.error(e)
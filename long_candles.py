@@ -2,7 +2,10 @@ import os
 import json
 import time
 import logging.config
-from classes import Settings, Cache, Profile
+import numpy as np
+from classes import Settings, CandleSeries, ColumnarStore, Profile, RedisTokenBucket
+from classes.coverage import Coverage
+from classes.candles import CANDLE_DTYPE, to_array, merge
 from XTBApi.api import Client
 from redis.exceptions import ConnectionError
 from datetime import datetime
@@ -59,19 +62,36 @@ class Result:
         logger = logging.getLogger('xtb.long_candles')
         logger.setLevel(logging.DEBUG)
         x = self.app.param
-        # get charts
+        if not client:
+            return
         now = int(datetime.now().timestamp())
-        res = client.get_chart_range_request(self.symbol, x.timeframe, now, now, -10_000) if client else {}
-        rate_infos = res.get('rateInfos', [])
-        logger.debug(f'recv {self.symbol} {len(rate_infos)} ticks.')
-        # caching
+        series = CandleSeries(x.account.mode, self.symbol, x.timeframe)
+        coverage = Coverage(x.account.mode, self.symbol, x.timeframe)
+        # only closed candles count as complete, the forming one is a hole until next run
+        horizon_ctm, closed_ctm = (now - series.ttl_s) * 1000, (now - x.timeframe*60) * 1000
+        cached, fetched = np.empty(0, dtype=CANDLE_DTYPE), []
         try:
-            cache = Cache()
-            key_group = f'{x.account.mode}_{self.symbol}_{x.timeframe}'
-            for ctm in rate_infos:
-                cache.set_key(f'{key_group}:{ctm["ctm"]}', ctm, ttl_s=x.timeframe*172_800)
+            if not coverage.load():
+                # rebuilt from the cached series, whose candles the local history may lack too
+                cached = series.read(start_ctm=horizon_ctm)
+                cached = cached[cached['ctm'] <= closed_ctm]
+                coverage.add_ctms(cached['ctm'])
+            # get charts, just the holes of the series while the market was open
+            for start_ctm, end_ctm in coverage.gaps(horizon_ctm, now * 1000, hours=client.hours):
+                res = client.get_chart_range_request(self.symbol, x.timeframe, start_ctm // 1000, end_ctm // 1000, 0)
+                rate_infos = res.get('rateInfos', [])
+                logger.debug(f'recv {self.symbol} {len(rate_infos)} ticks for {start_ctm}-{end_ctm}.')
+                # caching
+                series.write(rate_infos)
+                coverage.add(start_ctm, min(end_ctm, closed_ctm))
+                fetched.extend(rate_infos)
+            coverage.save(series.ttl_s)
         except ConnectionError as e:
             logger.error(e)
+        # local history keeps closed candles only, repaired holes are merged into it
+        closed = merge(cached, to_array([c for c in fetched if c['ctm'] <= closed_ctm]))
+        store = ColumnarStore(x.account.mode, self.symbol, x.timeframe)
+        logger.debug(f'stored {self.symbol} {store.merge(closed)} new candles.')
 
 
 def run(app: Profile):
@@ -80,7 +100,7 @@ def run(app: Profile):
     # Start here
     logger.debug(f'Running: {app.param}')
     # start X connection
-    client = Client()
+    client = Client(limiter=RedisTokenBucket(x.account.name))
     client.login(x.account.name, x.account.secret, mode=x.account.mode)
     logger.debug('Enter the Gate.')
 